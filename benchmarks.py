@@ -0,0 +1,511 @@
+"""Micro-benchmarks for the tree structures in treeProject.py.
+
+Run ``python benchmarks.py --help`` to list the available benchmarks.
+Benchmarks that compare against an earlier implementation accept
+``--baseline PATH`` pointing at another copy of treeProject.py, e.g.::
+
+    git show HEAD~1:treeProject.py > /tmp/treeProject_old.py
+    python benchmarks.py rb-delete --baseline /tmp/treeProject_old.py
+"""
+import argparse
+import importlib.util
+import math
+import os
+import random
+import time
+import tracemalloc
+
+import treeProject
+
+
+def load_module(path, name='treeProject_baseline'):
+    """Import a copy of treeProject.py from an arbitrary path."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def timed(func, *args):
+    """Return the wall-clock seconds taken by func(*args)."""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def report(title, rows):
+    """Print a two-column table of (label, value) rows."""
+    print(title)
+    width = max(len(label) for label, _ in rows)
+    for label, value in rows:
+        print(f"  {label:<{width}}  {value}")
+
+
+# ==================== RED-BLACK TREE ====================
+def bench_rb_delete(module, n, repeat, seed):
+    """Fill a RedBlackTree with n keys, then delete them all in random order."""
+    rng = random.Random(seed)
+    keys = list(range(n))
+    best = float('inf')
+    for _ in range(repeat):
+        tree = module.RedBlackTree()
+        rng.shuffle(keys)
+        for key in keys:
+            tree.insert(key)
+        rng.shuffle(keys)
+
+        def delete_all():
+            for key in keys:
+                tree.delete(key)
+
+        best = min(best, timed(delete_all))
+    return n / best
+
+
+def cmd_rb_delete(args):
+    modules = [('current', treeProject)]
+    if args.baseline:
+        modules.append(('baseline', load_module(args.baseline)))
+    rows = []
+    for label, module in modules:
+        rate = bench_rb_delete(module, args.n, args.repeat, args.seed)
+        rows.append((label, f"{rate:,.0f} deletes/s"))
+    report(f"RedBlackTree delete throughput (n={args.n}, best of {args.repeat})", rows)
+
+
+# ==================== B-TREE ====================
+def bench_btree(order, keys, lookups):
+    """Seconds to insert keys, look up lookups and delete half the keys."""
+    tree = treeProject.BTree(order)
+    insert = timed(lambda: [tree.insert(key) for key in keys])
+    search = timed(lambda: [tree.search(key) for key in lookups])
+    delete = timed(lambda: [tree.delete(key) for key in keys[::2]])
+    return insert, search, delete
+
+
+def cmd_btree(args):
+    rng = random.Random(args.seed)
+    keys = rng.sample(range(args.n * 10), args.n)
+    lookups = [rng.choice(keys) for _ in range(args.n)]
+    rows = []
+    for order in args.orders:
+        insert, search, delete = bench_btree(order, keys, lookups)
+        n = args.n
+        rows.append((f"order {order}", f"insert {n / insert:>10,.0f}/s   search {n / search:>10,.0f}/s"
+                                       f"   delete {n / 2 / delete:>10,.0f}/s"))
+    report(f"BTree throughput by order (n={args.n})", rows)
+
+
+# ==================== SPLAY TREE ====================
+def zipf_trace(keys, length, s, rng):
+    """Access trace where the i-th most popular key has weight 1 / i**s."""
+    popular = keys[:]
+    rng.shuffle(popular)
+    weights = [1 / (rank ** s) for rank in range(1, len(popular) + 1)]
+    return rng.choices(popular, weights=weights, k=length)
+
+
+def bench_splay_trace(factory, keys, trace):
+    """Searches per second replaying trace on a tree holding keys."""
+    tree = factory()
+    for key in keys:
+        tree.insert(key)
+    seconds = timed(lambda: [tree.search(key) for key in trace])
+    return len(trace) / seconds
+
+
+def cmd_splay_engines(args):
+    rng = random.Random(args.seed)
+    keys = rng.sample(range(args.n * 10), args.n)
+    traces = [('uniform', [rng.choice(keys) for _ in range(args.accesses)])]
+    for s in args.zipf:
+        traces.append((f"zipf s={s}", zipf_trace(keys, args.accesses, s, rng)))
+    rows = []
+    for trace_name, trace in traces:
+        for name in ('SplayTree', 'TopDownSplayTree'):
+            rate = bench_splay_trace(getattr(treeProject, name), keys, trace)
+            rows.append((f"{trace_name:<12} {name}", f"{rate:>10,.0f} searches/s"))
+    report(f"Splay engines (n={args.n}, {args.accesses} accesses)", rows)
+
+
+def cmd_splay_policies(args):
+    rng = random.Random(args.seed)
+    keys = rng.sample(range(args.n * 10), args.n)
+    ordered = sorted(keys)
+    traces = [
+        ('uniform', [rng.choice(keys) for _ in range(args.accesses)]),
+        ('zipf s=1.0', zipf_trace(keys, args.accesses, 1.0, rng)),
+        ('sequential', [ordered[i % args.n] for i in range(args.accesses)]),
+    ]
+    depth = 2 * args.n.bit_length()
+    policies = [
+        ('full', lambda: treeProject.FullSplay()),
+        ('semi', lambda: treeProject.SemiSplay()),
+        (f"depth>{depth}", lambda: treeProject.DepthThresholdSplay(depth)),
+        ('random p=0.1', lambda: treeProject.RandomizedSplay(0.1, seed=args.seed)),
+    ]
+    rows = []
+    for trace_name, trace in traces:
+        for policy_name, policy in policies:
+            rate = bench_splay_trace(lambda: treeProject.SplayTree(policy()), keys, trace)
+            rows.append((f"{trace_name:<11} {policy_name}", f"{rate:>10,.0f} searches/s"))
+    report(f"SplayTree policies (n={args.n}, {args.accesses} accesses)", rows)
+
+
+# ==================== K-D TREE ====================
+def kd_depth(node):
+    """Height of a KDTree subtree, counted in nodes."""
+    depth, level = 0, [node] if node else []
+    while level:
+        depth += 1
+        level = [child for n in level for child in (n.left, n.right) if child]
+    return depth
+
+
+def cmd_kd_build(args):
+    rng = random.Random(args.seed)
+    points = [[rng.random() for _ in range(args.k)] for _ in range(args.n)]
+    queries = [[rng.random() for _ in range(args.k)] for _ in range(args.queries)]
+
+    def incremental():
+        tree = treeProject.KDTree(args.k)
+        for point in sorted(points) if args.sorted else points:
+            tree.insert(point)
+        return tree
+
+    builders = [
+        ('insert', incremental),
+        ('build cycle', lambda: treeProject.KDTree.build(points, args.k)),
+        ('build spread', lambda: treeProject.KDTree.build(points, args.k, axis_selection='spread')),
+    ]
+    rows = []
+    for name, builder in builders:
+        start = time.perf_counter()
+        tree = builder()
+        seconds = time.perf_counter() - start
+        search = timed(lambda: [tree.nearest_neighbor(q) for q in queries])
+        rows.append((name, f"build {seconds:6.2f}s   depth {kd_depth(tree.root):4}"
+                           f"   nearest {args.queries / search:>8,.0f}/s"))
+    order = 'sorted' if args.sorted else 'random'
+    report(f"KDTree construction (n={args.n}, k={args.k}, {order} insert order)", rows)
+
+
+def cmd_kd_dynamic(args):
+    rng = random.Random(args.seed)
+    ops = []
+    live = []
+    for step in range(args.ops):
+        if live and rng.random() < args.delete_ratio:
+            ops.append(('delete', live.pop(rng.randrange(len(live)))))
+        else:
+            # a slowly drifting stream, like the timestamps of live data
+            point = [step / args.ops + rng.random() * args.noise for _ in range(args.k)]
+            live.append(point)
+            ops.append(('insert', point))
+    queries = [[rng.random() for _ in range(args.k)] for _ in range(args.queries)]
+    rows = []
+    for alpha in [None] + args.alphas:
+        tree = treeProject.KDTree(args.k, alpha=alpha)
+
+        def replay():
+            for op, point in ops:
+                getattr(tree, op)(point)
+
+        seconds = timed(replay)
+        search = timed(lambda: [tree.nearest_neighbor(q) for q in queries])
+        rows.append((f"alpha={alpha}", f"updates {args.ops / seconds:>8,.0f}/s   depth {kd_depth(tree.root):5}"
+                                       f"   nearest {args.queries / search:>8,.0f}/s   rebuilds {tree.rebuilds:5}"
+                                       f" ({tree.rebuilt_nodes:,} nodes)"))
+    report(f"KDTree streaming updates ({args.ops} ops, {args.delete_ratio:.0%} deletes, k={args.k})", rows)
+
+
+def cmd_kd_churn(args):
+    rng = random.Random(args.seed)
+    initial = [[rng.random() for _ in range(args.k)] for _ in range(args.n)]
+    fresh = [[rng.random() for _ in range(args.k)] for _ in range(args.ops)]
+    modes = [('delete in place', {}), ('scapegoat alpha=0.75', {'alpha': 0.75})]
+    modes += [(f"tombstones t={t}", {'tombstone_threshold': t}) for t in args.thresholds]
+    rows = []
+    for name, options in modes:
+        tree = treeProject.KDTree.build(initial, args.k, **options)
+        live = list(initial)
+
+        def churn():
+            for point in fresh:
+                victim = live.pop(rng.randrange(len(live)))
+                tree.delete(victim)
+                tree.insert(point)
+                live.append(point)
+
+        seconds = timed(churn)
+        rows.append((name, f"{args.ops / seconds:>8,.0f} delete+insert/s   depth {kd_depth(tree.root):4}"
+                           f"   compactions {tree.compactions:3}"))
+    report(f"KDTree churn (n={args.n}, {args.ops} delete+insert pairs, k={args.k})", rows)
+
+
+def cmd_kd_flat(args):
+    rng = random.Random(args.seed)
+    points = [[rng.random() for _ in range(args.k)] for _ in range(args.n)]
+    queries = [[rng.random() for _ in range(args.k)] for _ in range(args.queries)]
+    start = time.perf_counter()
+    tree = treeProject.KDTree.build(points, args.k)
+    rows = [('KDTree build', f"{time.perf_counter() - start:8.2f}s")]
+    seconds = timed(lambda: [tree.knn(q, args.neighbors) for q in queries])
+    rows.append(('KDTree knn', f"{args.queries / seconds:>8,.0f} queries/s"))
+    for leaf_size in args.leaf_sizes:
+        start = time.perf_counter()
+        flat = treeProject.FlatKDTree(points, leaf_size)
+        build = time.perf_counter() - start
+        rows.append((f"FlatKDTree leaf={leaf_size} build", f"{build:8.2f}s"))
+        seconds = timed(lambda: [flat.query(q, args.neighbors) for q in queries])
+        rows.append((f"FlatKDTree leaf={leaf_size} query", f"{args.queries / seconds:>8,.0f} queries/s"))
+        seconds = timed(flat.query_batch, queries, args.neighbors)
+        rows.append((f"FlatKDTree leaf={leaf_size} query_batch", f"{args.queries / seconds:>8,.0f} queries/s"))
+    report(f"KDTree vs FlatKDTree (n={args.n}, k={args.k}, {args.neighbors} neighbors)", rows)
+
+
+def cmd_kd_parallel(args):
+    rng = random.Random(args.seed)
+    points = [[rng.random() for _ in range(args.k)] for _ in range(args.n)]
+    queries = [[rng.random() for _ in range(args.k)] for _ in range(args.queries)]
+    tree = treeProject.KDTree.build(points, args.k)
+    rows = []
+    for workers in args.workers:
+        seconds = timed(lambda: list(tree.query_many(queries, args.neighbors, workers=workers)))
+        rows.append((f"workers={workers}", f"{args.queries / seconds:>8,.0f} queries/s"))
+    report(f"KDTree.query_many (n={args.n}, k={args.k}, {args.neighbors} neighbors, "
+           f"{os.cpu_count()} cpus)", rows)
+
+
+def cmd_kd_range(args):
+    rng = random.Random(args.seed)
+    points = [[rng.random() for _ in range(args.k)] for _ in range(args.n)]
+    boxes = []
+    for _ in range(args.queries):
+        low = [rng.random() * (1 - args.width) for _ in range(args.k)]
+        boxes.append((low, [c + args.width for c in low]))
+    modules = [('current', treeProject)]
+    if args.baseline:
+        modules.append(('baseline', load_module(args.baseline)))
+    rows = []
+    for label, module in modules:
+        tree = module.KDTree(args.k)
+        seconds = timed(lambda: [tree.insert(point) for point in points])
+        rows.append((f"{label} insert", f"{args.n / seconds:>8,.0f} points/s"))
+        seconds = timed(lambda: [tree.range_search(low, high) for low, high in boxes])
+        rows.append((f"{label} range_search", f"{args.queries / seconds:>8,.0f} queries/s"))
+        if hasattr(tree, 'range_count'):
+            seconds = timed(lambda: [tree.range_count(low, high) for low, high in boxes])
+            rows.append((f"{label} range_count", f"{args.queries / seconds:>8,.0f} queries/s"))
+        # boxes must stay exact while points leave, so deletes are part of the price
+        victims = points[:]
+        random.Random(args.seed).shuffle(victims)
+        victims = victims[:args.n // 2]
+        seconds = timed(lambda: [tree.delete(point) for point in victims])
+        rows.append((f"{label} delete", f"{len(victims) / seconds:>8,.0f} points/s"))
+    report(f"KDTree range queries (n={args.n}, k={args.k}, box side {args.width})", rows)
+
+
+def cmd_kd_approx(args):
+    rng = random.Random(args.seed)
+    centers = [[rng.random() for _ in range(args.k)] for _ in range(args.clusters)]
+    points = [[rng.gauss(c, 0.02) for c in rng.choice(centers)] for _ in range(args.n)]
+    queries = [[rng.gauss(c, 0.03) for c in rng.choice(centers)] for _ in range(args.queries)]
+    tree = treeProject.KDTree.build(points, args.k)
+    exact = [math.dist(tree.nearest_neighbor(q).point, q) for q in queries]
+    rows = []
+    for best_bin_first in (False, True):
+        for eps in args.eps:
+            for max_visits in [None] + args.max_visits:
+                visits = []
+                ratio = 0
+                start = time.perf_counter()
+                for q, true in zip(queries, exact):
+                    node = tree.nearest_neighbor(q, eps=eps, max_visits=max_visits,
+                                                 best_bin_first=best_bin_first)
+                    visits.append(tree.last_visits)
+                    ratio += math.dist(node.point, q) / true if true else 1
+                seconds = time.perf_counter() - start
+                visits.sort()
+                mode = 'best-bin-first' if best_bin_first else 'depth-first'
+                rows.append((f"{mode:<14} eps={eps:<4} max_visits={max_visits}",
+                             f"{args.queries / seconds:>8,.0f} q/s   visits mean {sum(visits) / len(visits):7.0f}"
+                             f"  p99 {visits[len(visits) * 99 // 100]:6}   distance / exact {ratio / len(queries):.3f}"))
+    report(f"KDTree approximate nearest neighbor (n={args.n}, k={args.k}, {args.clusters} clusters)", rows)
+
+
+def cmd_kd_metrics(args):
+    rng = random.Random(args.seed)
+    metrics = [('euclidean', treeProject.EuclideanMetric()), ('manhattan', treeProject.ManhattanMetric()),
+               ('chebyshev', treeProject.ChebyshevMetric()),
+               ('weighted euclidean', treeProject.EuclideanMetric([1 + i for i in range(args.k)]))]
+    pairs = [([rng.random() for _ in range(args.k)], [rng.random() for _ in range(args.k)])
+             for _ in range(args.kernel_calls)]
+
+    def generic(a, b):
+        return sum((x - y) ** 2 for x, y in zip(a, b))
+
+    rows = []
+    for name, kernel in [('generic sum/zip', generic)] + [(name, m.kernel(args.k)) for name, m in metrics]:
+        seconds = timed(lambda: [kernel(a, b) for a, b in pairs])
+        rows.append((f"kernel {name}", f"{args.kernel_calls / seconds / 1e6:8.2f} M calls/s"))
+
+    points = [[rng.random() for _ in range(args.k)] for _ in range(args.n)]
+    queries = [[rng.random() for _ in range(args.k)] for _ in range(args.queries)]
+    for name, metric in metrics:
+        tree = treeProject.KDTree.build(points, args.k, metric=metric)
+        seconds = timed(lambda: [tree.knn(q, args.neighbors) for q in queries])
+        rows.append((f"KDTree.knn {name}", f"{args.queries / seconds:>10,.0f} queries/s"))
+        if treeProject.np is not None:
+            flat = treeProject.FlatKDTree(points, metric=metric)
+            seconds = timed(flat.query_batch, queries, args.neighbors)
+            rows.append((f"FlatKDTree.query_batch {name}", f"{args.queries / seconds:>10,.0f} queries/s"))
+    report(f"KDTree metrics (n={args.n}, k={args.k}, {args.neighbors} neighbors)", rows)
+
+
+# ==================== MEMORY ====================
+def bytes_per_node(factory, items):
+    """Traced allocation per inserted item, excluding the items themselves."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tree = factory()
+    for item in items:
+        tree.insert(item)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tree
+    return (after - before) / len(items)
+
+
+def cmd_memory(args):
+    rng = random.Random(args.seed)
+    keys = rng.sample(range(args.n * 10), args.n)
+    points = [[rng.randrange(10**6), rng.randrange(10**6)] for _ in range(args.n)]
+    modules = [('current', treeProject)]
+    if args.baseline:
+        modules.append(('baseline', load_module(args.baseline)))
+    rows = []
+    for label, module in modules:
+        for name, items in (('RedBlackTree', keys), ('RBArenaTree', keys), ('SplayTree', keys),
+                            ('TopDownSplayTree', keys), ('KDTree', points)):
+            factory = getattr(module, name, None)
+            if factory is None:
+                continue
+            rows.append((f"{label} {name}", f"{bytes_per_node(factory, items):6.1f} bytes/node"))
+    report(f"Memory per node (n={args.n}, keys not counted)", rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rb_delete = sub.add_parser('rb-delete', help='RedBlackTree delete-heavy workload')
+    rb_delete.add_argument('-n', type=int, default=200_000)
+    rb_delete.add_argument('--repeat', type=int, default=3)
+    rb_delete.add_argument('--seed', type=int, default=1)
+    rb_delete.add_argument('--baseline', help='path to another treeProject.py to compare')
+    rb_delete.set_defaults(func=cmd_rb_delete)
+
+    btree = sub.add_parser('btree', help='BTree throughput across orders')
+    btree.add_argument('-n', type=int, default=200_000)
+    btree.add_argument('--orders', type=int, nargs='+', default=[4, 8, 16, 32, 64, 128, 256])
+    btree.add_argument('--seed', type=int, default=1)
+    btree.set_defaults(func=cmd_btree)
+
+    splay = sub.add_parser('splay-engines', help='bottom-up vs top-down splaying on skewed traces')
+    splay.add_argument('-n', type=int, default=100_000)
+    splay.add_argument('--accesses', type=int, default=300_000)
+    splay.add_argument('--zipf', type=float, nargs='+', default=[0.8, 1.0, 1.2])
+    splay.add_argument('--seed', type=int, default=1)
+    splay.set_defaults(func=cmd_splay_engines)
+
+    policies = sub.add_parser('splay-policies', help='SplayTree splay policies on several traces')
+    policies.add_argument('-n', type=int, default=100_000)
+    policies.add_argument('--accesses', type=int, default=300_000)
+    policies.add_argument('--seed', type=int, default=1)
+    policies.set_defaults(func=cmd_splay_policies)
+
+    kd_build = sub.add_parser('kd-build', help='KDTree incremental insert vs median-split build')
+    kd_build.add_argument('-n', type=int, default=100_000)
+    kd_build.add_argument('-k', type=int, default=2)
+    kd_build.add_argument('--queries', type=int, default=10_000)
+    kd_build.add_argument('--sorted', action='store_true', help='insert points in sorted order')
+    kd_build.add_argument('--seed', type=int, default=1)
+    kd_build.set_defaults(func=cmd_kd_build)
+
+    kd_dynamic = sub.add_parser('kd-dynamic', help='KDTree static vs scapegoat rebalancing under updates')
+    kd_dynamic.add_argument('--ops', type=int, default=50_000)
+    kd_dynamic.add_argument('-k', type=int, default=2)
+    kd_dynamic.add_argument('--delete-ratio', type=float, default=0.3)
+    kd_dynamic.add_argument('--alphas', type=float, nargs='+', default=[0.6, 0.75, 0.9])
+    kd_dynamic.add_argument('--noise', type=float, default=0.1, help='random spread around the drift')
+    kd_dynamic.add_argument('--queries', type=int, default=5_000)
+    kd_dynamic.add_argument('--seed', type=int, default=1)
+    kd_dynamic.set_defaults(func=cmd_kd_dynamic)
+
+    kd_churn = sub.add_parser('kd-churn', help='KDTree delete strategies under steady churn')
+    kd_churn.add_argument('-n', type=int, default=50_000)
+    kd_churn.add_argument('-k', type=int, default=2)
+    kd_churn.add_argument('--ops', type=int, default=20_000)
+    kd_churn.add_argument('--thresholds', type=float, nargs='+', default=[0.1, 0.25, 0.5])
+    kd_churn.add_argument('--seed', type=int, default=1)
+    kd_churn.set_defaults(func=cmd_kd_churn)
+
+    kd_flat = sub.add_parser('kd-flat', help='KDTree knn vs NumPy FlatKDTree (needs numpy)')
+    kd_flat.add_argument('-n', type=int, default=200_000)
+    kd_flat.add_argument('-k', type=int, default=3)
+    kd_flat.add_argument('--neighbors', type=int, default=8)
+    kd_flat.add_argument('--queries', type=int, default=5_000)
+    kd_flat.add_argument('--leaf-sizes', type=int, nargs='+', default=[16, 32, 64])
+    kd_flat.add_argument('--seed', type=int, default=1)
+    kd_flat.set_defaults(func=cmd_kd_flat)
+
+    kd_parallel = sub.add_parser('kd-parallel', help='KDTree.query_many across worker counts')
+    kd_parallel.add_argument('-n', type=int, default=200_000)
+    kd_parallel.add_argument('-k', type=int, default=3)
+    kd_parallel.add_argument('--neighbors', type=int, default=1)
+    kd_parallel.add_argument('--queries', type=int, default=50_000)
+    kd_parallel.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    kd_parallel.add_argument('--seed', type=int, default=1)
+    kd_parallel.set_defaults(func=cmd_kd_parallel)
+
+    kd_range = sub.add_parser('kd-range', help='KDTree range_search and range_count')
+    kd_range.add_argument('-n', type=int, default=100_000)
+    kd_range.add_argument('-k', type=int, default=2)
+    kd_range.add_argument('--width', type=float, default=0.1, help='side of each query box')
+    kd_range.add_argument('--queries', type=int, default=1_000)
+    kd_range.add_argument('--seed', type=int, default=1)
+    kd_range.add_argument('--baseline', help='path to another treeProject.py to compare')
+    kd_range.set_defaults(func=cmd_kd_range)
+
+    kd_approx = sub.add_parser('kd-approx', help='KDTree approximate nearest neighbor: eps and visit budget')
+    kd_approx.add_argument('-n', type=int, default=20_000)
+    kd_approx.add_argument('-k', type=int, default=8)
+    kd_approx.add_argument('--clusters', type=int, default=20)
+    kd_approx.add_argument('--eps', type=float, nargs='+', default=[0.0, 0.5, 1.0])
+    kd_approx.add_argument('--max-visits', type=int, nargs='+', default=[200])
+    kd_approx.add_argument('--queries', type=int, default=200)
+    kd_approx.add_argument('--seed', type=int, default=1)
+    kd_approx.set_defaults(func=cmd_kd_approx)
+
+    kd_metrics = sub.add_parser('kd-metrics', help='KDTree distance kernels and metrics')
+    kd_metrics.add_argument('-n', type=int, default=100_000)
+    kd_metrics.add_argument('-k', type=int, default=2)
+    kd_metrics.add_argument('--neighbors', type=int, default=4)
+    kd_metrics.add_argument('--queries', type=int, default=5_000)
+    kd_metrics.add_argument('--kernel-calls', type=int, default=500_000)
+    kd_metrics.add_argument('--seed', type=int, default=1)
+    kd_metrics.set_defaults(func=cmd_kd_metrics)
+
+    memory = sub.add_parser('memory', help='bytes per node of each tree')
+    memory.add_argument('-n', type=int, default=100_000)
+    memory.add_argument('--seed', type=int, default=1)
+    memory.add_argument('--baseline', help='path to another treeProject.py to compare')
+    memory.set_defaults(func=cmd_memory)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,257 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import math
+import os
+import random
+import struct
+from heapq import heappush, heappop, heapreplace
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # só a FlatKDTree precisa de numpy
+    np = None
+
+# ==================== PERCURSO ORDENADO ====================
+# Percurso em ordem para árvores binárias com ponteiro para o pai (RedBlackTree e
+# SplayTree). Usa apenas testes booleanos nos filhos, então funciona tanto com
+# None quanto com a sentinela RB_NIL. Nada aqui faz splay nem aloca listas.
+class OrderedTreeMixin:
+    def __iter__(self):
+        node = self._first_node()
+        while node:
+            yield node.value
+            node = self._next_node(node)
+
+    def __reversed__(self):
+        node = self._last_node()
+        while node:
+            yield node.value
+            node = self._prev_node(node)
+
+    # chaves entre lo e hi; None deixa o limite aberto
+    def irange(self, lo=None, hi=None, inclusive=(True, True), reverse=False):
+        lo_inclusive, hi_inclusive = inclusive
+        if reverse:
+            node = self._last_node() if hi is None else self._upper_node(hi, hi_inclusive)
+            while node:
+                value = node.value
+                if lo is not None and (value < lo or (value == lo and not lo_inclusive)):
+                    return
+                yield value
+                node = self._prev_node(node)
+        else:
+            node = self._first_node() if lo is None else self._lower_node(lo, lo_inclusive)
+            while node:
+                value = node.value
+                if hi is not None and (value > hi or (value == hi and not hi_inclusive)):
+                    return
+                yield value
+                node = self._next_node(node)
+
+    # maior chave <= value
+    def floor(self, value):
+        return self._value_of(self._upper_node(value, True))
+
+    # menor chave >= value
+    def ceiling(self, value):
+        return self._value_of(self._lower_node(value, True))
+
+    # menor chave > value
+    def successor(self, value):
+        return self._value_of(self._lower_node(value, False))
+
+    # maior chave < value
+    def predecessor(self, value):
+        return self._value_of(self._upper_node(value, False))
+
+    def _value_of(self, node):
+        return node.value if node else None
+
+    def _first_node(self):
+        node = self.root
+        if node:
+            while node.left:
+                node = node.left
+        return node
+
+    def _last_node(self):
+        node = self.root
+        if node:
+            while node.right:
+                node = node.right
+        return node
+
+    # sucessor em O(1) amortizado usando o ponteiro para o pai
+    def _next_node(self, node):
+        if node.right:
+            node = node.right
+            while node.left:
+                node = node.left
+            return node
+        parent = node.parent
+        while parent and node is parent.right:
+            node = parent
+            parent = parent.parent
+        return parent
+
+    def _prev_node(self, node):
+        if node.left:
+            node = node.left
+            while node.right:
+                node = node.right
+            return node
+        parent = node.parent
+        while parent and node is parent.left:
+            node = parent
+            parent = parent.parent
+        return parent
+
+    # primeiro nó com chave >= value (ou > value se não inclusivo)
+    def _lower_node(self, value, inclusive):
+        current = self.root
+        best = None
+        while current:
+            if current.value > value or (inclusive and current.value == value):
+                best = current
+                current = current.left
+            else:
+                current = current.right
+        return best
+
+    # último nó com chave <= value (ou < value se não inclusivo)
+    def _upper_node(self, value, inclusive):
+        current = self.root
+        best = None
+        while current:
+            if current.value < value or (inclusive and current.value == value):
+                best = current
+                current = current.right
+            else:
+                current = current.left
+        return best
 
 # ==================== RED-BLACK TREE ====================
+# cores guardadas como booleanos para economizar memória por nó
+RED = True
+BLACK = False
+
 class RBNode:
+    __slots__ = ('value', 'left', 'right', 'parent', 'color', 'size')
+
     def __init__(self, value):
         self.value = value
+        self.left = RB_NIL
+        self.right = RB_NIL
+        self.parent = RB_NIL
+        self.color = RED
+        self.size = 1  # nós na subárvore (estatística de ordem)
+
+# sentinela NIL compartilhada (CLRS): preta, tamanho zero e falsa em testes booleanos
+class _RBNil(RBNode):
+    __slots__ = ()
+
+    def __init__(self):
+        self.value = None
         self.left = None
         self.right = None
         self.parent = None
-        self.color = 'RED'
+        self.color = BLACK
+        self.size = 0
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return 'RB_NIL'
 
-class RedBlackTree:
+RB_NIL = _RBNil()
+
+class RedBlackTree(OrderedTreeMixin):
     def __init__(self):
-        self.root = None
-    
+        self.root = RB_NIL
+
+    # construção em O(n) a partir de chaves ordenadas
+    @classmethod
+    def from_sorted(cls, iterable):
+        tree = cls()
+        values = []
+        for value in iterable:
+            if values:
+                if value < values[-1]:
+                    raise ValueError("from_sorted exige valores em ordem crescente")
+                if value == values[-1]:
+                    continue  # Duplicate
+            values.append(value)
+        tree.root = tree._build_balanced(values)
+        return tree
+
+    # inserção em lote: ordena e remove duplicatas antes de reconstruir
+    def bulk_insert(self, iterable):
+        new_values = sorted(set(iterable))
+        if not new_values:
+            return
+        merged = []
+        existing = self._inorder_values()
+        i = j = 0
+        while i < len(existing) and j < len(new_values):
+            if existing[i] < new_values[j]:
+                merged.append(existing[i])
+                i += 1
+            elif new_values[j] < existing[i]:
+                merged.append(new_values[j])
+                j += 1
+            else:
+                merged.append(existing[i])
+                i += 1
+                j += 1
+        merged.extend(existing[i:])
+        merged.extend(new_values[j:])
+        self.root = self._build_balanced(merged)
+
+    # monta a árvore pelo meio da lista; só o último nível (incompleto) fica vermelho
+    def _build_balanced(self, values):
+        n = len(values)
+        if n == 0:
+            return RB_NIL
+        max_depth = n.bit_length() - 1
+
+        def build(lo, hi, depth, parent):
+            if lo > hi:
+                return RB_NIL
+            mid = (lo + hi) // 2
+            node = RBNode(values[mid])
+            node.parent = parent
+            node.color = RED if depth == max_depth and depth > 0 else BLACK
+            node.left = build(lo, mid - 1, depth + 1, node)
+            node.right = build(mid + 1, hi, depth + 1, node)
+            node.size = hi - lo + 1
+            return node
+
+        return build(0, n - 1, 0, RB_NIL)
+
+    def _inorder_values(self):
+        values = []
+        stack = []
+        current = self.root
+        while stack or current is not RB_NIL:
+            while current is not RB_NIL:
+                stack.append(current)
+                current = current.left
+            current = stack.pop()
+            values.append(current.value)
+            current = current.right
+        return values
+
     # inserção
     def insert(self, value):
-        node = RBNode(value)
-        if not self.root:
-            self.root = node
-            self.root.color = 'BLACK'
-            return
-        
-        parent = None
+        nil = RB_NIL
+        parent = nil
         current = self.root
         
-        while current:
+        while current is not nil:
             parent = current
             if value < current.value:
                 current = current.left
@@ -35,83 +260,99 @@ class RedBlackTree:
             else:
                 return  # Duplicate
         
+        node = RBNode(value)
         node.parent = parent
-        if value < parent.value:
+        if parent is nil:
+            self.root = node
+        elif value < parent.value:
             parent.left = node
         else:
             parent.right = node
         
+        # atualiza tamanhos no caminho até a raiz
+        while parent is not nil:
+            parent.size += 1
+            parent = parent.parent
+        
         self._fix_insert(node)
     
     # balanceamento da inserção
     def _fix_insert(self, node):
-        while node.parent and node.parent.color == 'RED':
-            if node.parent == node.parent.parent.left:
-                uncle = node.parent.parent.right
-                if uncle and uncle.color == 'RED':
-                    node.parent.color = 'BLACK'
-                    uncle.color = 'BLACK'
-                    node.parent.parent.color = 'RED'
-                    node = node.parent.parent
+        while node.parent.color is RED:
+            grandparent = node.parent.parent
+            if node.parent is grandparent.left:
+                uncle = grandparent.right
+                if uncle.color is RED:
+                    node.parent.color = BLACK
+                    uncle.color = BLACK
+                    grandparent.color = RED
+                    node = grandparent
                 else:
-                    if node == node.parent.right:
+                    if node is node.parent.right:
                         node = node.parent
                         self._rotate_left(node)
-                    node.parent.color = 'BLACK'
-                    node.parent.parent.color = 'RED'
+                    node.parent.color = BLACK
+                    node.parent.parent.color = RED
                     self._rotate_right(node.parent.parent)
             else:
-                uncle = node.parent.parent.left
-                if uncle and uncle.color == 'RED':
-                    node.parent.color = 'BLACK'
-                    uncle.color = 'BLACK'
-                    node.parent.parent.color = 'RED'
-                    node = node.parent.parent
+                uncle = grandparent.left
+                if uncle.color is RED:
+                    node.parent.color = BLACK
+                    uncle.color = BLACK
+                    grandparent.color = RED
+                    node = grandparent
                 else:
-                    if node == node.parent.left:
+                    if node is node.parent.left:
                         node = node.parent
                         self._rotate_right(node)
-                    node.parent.color = 'BLACK'
-                    node.parent.parent.color = 'RED'
+                    node.parent.color = BLACK
+                    node.parent.parent.color = RED
                     self._rotate_left(node.parent.parent)
-        self.root.color = 'BLACK'
+        # a raiz só chega vermelha aqui quando a altura negra da árvore cresce
+        grew = self.root.color is RED
+        self.root.color = BLACK
+        return grew
     
     # função para rotacionar para a esquerda
     def _rotate_left(self, node):
         right = node.right
         node.right = right.left
-        if right.left:
+        if right.left is not RB_NIL:
             right.left.parent = node
         right.parent = node.parent
-        if not node.parent:
+        if node.parent is RB_NIL:
             self.root = right
-        elif node == node.parent.left:
+        elif node is node.parent.left:
             node.parent.left = right
         else:
             node.parent.right = right
         right.left = node
         node.parent = right
+        right.size = node.size
+        node.size = node.left.size + node.right.size + 1
     
     # função para rotacionar para a direita
     def _rotate_right(self, node):
         left = node.left
         node.left = left.right
-        if left.right:
+        if left.right is not RB_NIL:
             left.right.parent = node
         left.parent = node.parent
-        if not node.parent:
+        if node.parent is RB_NIL:
             self.root = left
-        elif node == node.parent.right:
+        elif node is node.parent.right:
             node.parent.right = left
         else:
             node.parent.left = left
         left.right = node
         node.parent = left
+        left.size = node.size
+        node.size = node.left.size + node.right.size + 1
     
     # função de busca
     def search(self, value):
         current = self.root
-        while current:
+        while current is not RB_NIL:
             if value == current.value:
                 return current
             if value < current.value:
@@ -127,154 +368,883 @@ class RedBlackTree:
             return
         self._delete_node(node)
     
-    # função para remover
+    # função para remover (CLRS); x pode ser a sentinela, que guarda o pai temporariamente
     def _delete_node(self, node):
-        y = node
-        y_original_color = y.color
+        nil = RB_NIL
 
-        # x é o nó que ocupa a posição de y apos a remoção
-        if not node.left:
-            x = node.right
-            parent = node.parent
+        # o nó removido fisicamente é node ou seu sucessor; desconta do caminho
+        y = node if node.left is nil or node.right is nil else self._minimum(node.right)
+        ancestor = y.parent
+        while ancestor is not nil:
+            ancestor.size -= 1
+            ancestor = ancestor.parent
+
+        # x pode ser a sentinela, então o pai dele vai numa variável local em
+        # vez de RB_NIL.parent: a sentinela é de todas as árvores e nunca é
+        # escrita (não segura nós removidos nem mistura árvores entre threads)
+        y_original_color = y.color
+        if node.left is nil:
+            x, x_parent = node.right, node.parent
             self._transplant(node, node.right)
-        elif not node.right:
-            x = node.left
-            parent = node.parent
+        elif node.right is nil:
+            x, x_parent = node.left, node.parent
             self._transplant(node, node.left)
         else:
-            y = self._minimum(node.right)       # troca
-            y_original_color = y.color
             x = y.right
-            parent = y.parent if y.parent != node else y
-            if y.parent == node:
-                if x:
-                    x.parent = y
+            if y.parent is node:
+                x_parent = y
             else:
+                x_parent = y.parent
                 self._transplant(y, y.right)
                 y.right = node.right
-                if y.right:
-                    y.right.parent = y
+                y.right.parent = y
             self._transplant(node, y)
             y.left = node.left
-            if y.left:
-                y.left.parent = y
+            y.left.parent = y
             y.color = node.color
+            y.size = node.size
 
-        # caso de remoção de nó dupla-preto
-        if y_original_color == 'BLACK':
-            if x:
-                self._fix_delete(x)
-            else:
-                # cria um nó preto temporário para representar a dupla-preto
-                self._fix_delete_dummy(parent)
-
-    def _fix_delete_dummy(self, parent):
-        # Cria um nó preto ligado ao lado correto para fazer a correção
-        dummy = RBNode(None)
-        dummy.color = 'BLACK'
-        dummy.parent = parent
-        if parent:
-            if not parent.left and (parent.right is None or parent.right.value is not None):
-                parent.left = dummy
-            elif not parent.right and (parent.left is None or parent.left.value is not None):
-                parent.right = dummy
-            else:
-                if not parent.left:
-                    parent.left = dummy
-                else:
-                    parent.right = dummy
-        self._fix_delete(dummy)
-        # Remove o nó temporario
-        if dummy.parent:
-            if dummy.parent.left == dummy:
-                dummy.parent.left = None
-            elif dummy.parent.right == dummy:
-                dummy.parent.right = None
-
-    # função para balancear a remoção
-    def _fix_delete(self, node):
-        while node != self.root and self._is_black(node):
-            if not node.parent:
-                break
-            if node == node.parent.left:
-                sibling = node.parent.right
-                # Caso 2: irmão vermelho
-                if sibling and sibling.color == 'RED':
-                    sibling.color = 'BLACK'
-                    node.parent.color = 'RED'
-                    self._rotate_left(node.parent)
-                    sibling = node.parent.right
-                # Caso 3: irmão preto com filhos pretos
-                if sibling and self._is_black(sibling.left) and self._is_black(sibling.right):
-                    sibling.color = 'RED'
-                    node = node.parent
+        if y_original_color is BLACK:
+            self._fix_delete(x, x_parent)
+
+    # função para balancear a remoção (parent é o pai de node, que pode ser RB_NIL)
+    def _fix_delete(self, node, parent):
+        while node is not self.root and node.color is BLACK:
+            if node is parent.left:
+                sibling = parent.right
+                # Caso 1: irmão vermelho
+                if sibling.color is RED:
+                    sibling.color = BLACK
+                    parent.color = RED
+                    self._rotate_left(parent)
+                    sibling = parent.right
+                # Caso 2: irmão preto com filhos pretos
+                if sibling.left.color is BLACK and sibling.right.color is BLACK:
+                    sibling.color = RED
+                    node = parent
                 else:
-                    # Caso 4: irmão preto com filho próximo vermelho
-                    if sibling and self._is_black(sibling.right):
-                        if sibling.left:
-                            sibling.left.color = 'BLACK'
-                        if sibling:
-                            sibling.color = 'RED'
+                    # Caso 3: irmão preto com filho próximo vermelho
+                    if sibling.right.color is BLACK:
+                        sibling.left.color = BLACK
+                        sibling.color = RED
                         self._rotate_right(sibling)
-                        sibling = node.parent.right
-                    # Caso 5: irmão preto com filho distante vermelho
-                    if sibling:
-                        sibling.color = node.parent.color
-                    node.parent.color = 'BLACK'
-                    if sibling and sibling.right:
-                        sibling.right.color = 'BLACK'
-                    self._rotate_left(node.parent)
+                        sibling = parent.right
+                    # Caso 4: irmão preto com filho distante vermelho
+                    sibling.color = parent.color
+                    parent.color = BLACK
+                    sibling.right.color = BLACK
+                    self._rotate_left(parent)
                     node = self.root
             else:
-                sibling = node.parent.left
-                if sibling and sibling.color == 'RED':
-                    sibling.color = 'BLACK'
-                    node.parent.color = 'RED'
-                    self._rotate_right(node.parent)
-                    sibling = node.parent.left
-                if sibling and self._is_black(sibling.left) and self._is_black(sibling.right):
-                    sibling.color = 'RED'
-                    node = node.parent
+                sibling = parent.left
+                if sibling.color is RED:
+                    sibling.color = BLACK
+                    parent.color = RED
+                    self._rotate_right(parent)
+                    sibling = parent.left
+                if sibling.right.color is BLACK and sibling.left.color is BLACK:
+                    sibling.color = RED
+                    node = parent
                 else:
-                    if sibling and self._is_black(sibling.left):
-                        if sibling.right:
-                            sibling.right.color = 'BLACK'
-                        if sibling:
-                            sibling.color = 'RED'
+                    if sibling.left.color is BLACK:
+                        sibling.right.color = BLACK
+                        sibling.color = RED
                         self._rotate_left(sibling)
-                        sibling = node.parent.left
-                    if sibling:
-                        sibling.color = node.parent.color
-                    node.parent.color = 'BLACK'
-                    if sibling and sibling.left:
-                        sibling.left.color = 'BLACK'
-                    self._rotate_right(node.parent)
+                        sibling = parent.left
+                    sibling.color = parent.color
+                    parent.color = BLACK
+                    sibling.left.color = BLACK
+                    self._rotate_right(parent)
                     node = self.root
-        # garante que o nó final seja preto
-        if node:
-            node.color = 'BLACK'
+            parent = node.parent
+        # garante que o nó final seja preto (a sentinela já é preta e não é tocada)
+        if node is not RB_NIL:
+            node.color = BLACK
 
-    # altera cor para preto
-    def _is_black(self, node):
-        return node is None or node.color == 'BLACK'
+    # ---------- operações de conjunto baseadas em join ----------
+    # split/join/union/intersection/difference consomem as árvores recebidas
+    # (elas ficam vazias) e devolvem árvores novas, reaproveitando os nós.
+
+    # divide em (chaves < key, chaves >= key); esta árvore fica vazia
+    def split(self, key):
+        root, height = self.root, self._black_height(self.root)
+        self.root = RB_NIL
+        left, left_height, found, right, right_height = self._split_root(root, height, key)
+        if found:
+            right, right_height = self._join_roots(RB_NIL, 0, found, right, right_height)
+        return self._wrap(left), self._wrap(right)
+
+    # une left, key e right, com todas as chaves de left < key < todas as de right
+    @classmethod
+    def join(cls, left, key, right):
+        left_max = left._last_node()
+        right_min = right._first_node()
+        if (left_max and not left_max.value < key) or (right_min and not key < right_min.value):
+            raise ValueError("join exige left < key < right")
+        root, _ = cls._join_roots(left.root, cls._black_height(left.root), RBNode(key),
+                                  right.root, cls._black_height(right.root))
+        left.root = right.root = RB_NIL
+        return cls._wrap(root)
+
+    def union(self, other):
+        return self._set_operation('union', other)
+
+    def intersection(self, other):
+        return self._set_operation('intersection', other)
+
+    def difference(self, other):
+        return self._set_operation('difference', other)
+
+    def _set_operation(self, operation, other):
+        a, a_height = self.root, self._black_height(self.root)
+        b, b_height = other.root, self._black_height(other.root)
+        self.root = other.root = RB_NIL
+        function = {'union': self._union_roots,
+                    'intersection': self._intersection_roots,
+                    'difference': self._difference_roots}[operation]
+        root, _ = function(a, a_height, b, b_height)
+        return self._wrap(root)
+
+    @classmethod
+    def _wrap(cls, root):
+        tree = cls()
+        tree.root = root
+        return tree
+
+    # altura negra: pretos no caminho até a sentinela, contando o próprio nó
+    @staticmethod
+    def _black_height(node):
+        height = 0
+        while node is not RB_NIL:
+            if node.color is BLACK:
+                height += 1
+            node = node.left
+        return height
+
+    # separa os filhos de uma raiz preta em duas árvores independentes de raiz preta
+    @staticmethod
+    def _expose(node, height):
+        parts = []
+        for child in (node.left, node.right):
+            child_height = height - 1
+            if child is not RB_NIL:
+                child.parent = RB_NIL
+                if child.color is RED:
+                    child.color = BLACK
+                    child_height += 1
+            parts.append(child)
+            parts.append(child_height)
+        return parts
+
+    # join pela altura negra: desce pela espinha da árvore mais alta até um nó preto
+    # com a altura da outra, pendura mid (vermelho) ali e corrige com _fix_insert
+    @classmethod
+    def _join_roots(cls, left, left_height, mid, right, right_height):
+        nil = RB_NIL
+        mid.parent = nil
+        if left_height == right_height:
+            mid.left, mid.right = left, right
+            if left is not nil:
+                left.parent = mid
+            if right is not nil:
+                right.parent = mid
+            mid.color = BLACK
+            mid.size = left.size + right.size + 1
+            return mid, left_height + 1
+
+        tree = cls()
+        parent = nil
+        if left_height > right_height:
+            tree.root = current = left
+            height = left_height
+            while current.color is RED or height != right_height:
+                if current.color is BLACK:
+                    height -= 1
+                parent = current
+                current = current.right
+            parent.right = mid
+            mid.left, mid.right = current, right
+            attached = right
+        else:
+            tree.root = current = right
+            height = right_height
+            while current.color is RED or height != left_height:
+                if current.color is BLACK:
+                    height -= 1
+                parent = current
+                current = current.left
+            parent.left = mid
+            mid.left, mid.right = left, current
+            attached = left
+
+        mid.parent = parent
+        mid.color = RED
+        if current is not nil:
+            current.parent = mid
+        if attached is not nil:
+            attached.parent = mid
+        mid.size = mid.left.size + mid.right.size + 1
+        added = attached.size + 1
+        while parent is not nil:
+            parent.size += added
+            parent = parent.parent
+
+        grew = tree._fix_insert(mid)
+        return tree.root, max(left_height, right_height) + (1 if grew else 0)
+
+    # concatena duas árvores (todas as chaves de left < as de right)
+    @classmethod
+    def _join2_roots(cls, left, left_height, right, right_height):
+        if left is RB_NIL:
+            return right, right_height
+        node = left
+        while node.right is not RB_NIL:
+            node = node.right
+        left, left_height, last, _, _ = cls._split_root(left, left_height, node.value)
+        return cls._join_roots(left, left_height, last, right, right_height)
+
+    # devolve (menores, altura, nó igual a key ou None, maiores, altura)
+    @classmethod
+    def _split_root(cls, root, height, key):
+        if root is RB_NIL:
+            return RB_NIL, 0, None, RB_NIL, 0
+        left, left_height, right, right_height = cls._expose(root, height)
+        if key == root.value:
+            return left, left_height, root, right, right_height
+        if key < root.value:
+            low, low_height, found, high, high_height = cls._split_root(left, left_height, key)
+            high, high_height = cls._join_roots(high, high_height, root, right, right_height)
+        else:
+            low, low_height, found, high, high_height = cls._split_root(right, right_height, key)
+            low, low_height = cls._join_roots(left, left_height, root, low, low_height)
+        return low, low_height, found, high, high_height
+
+    @classmethod
+    def _union_roots(cls, a, a_height, b, b_height):
+        if a is RB_NIL:
+            return b, b_height
+        if b is RB_NIL:
+            return a, a_height
+        if a.size > b.size:
+            a, a_height, b, b_height = b, b_height, a, a_height
+        a_left, a_left_height, a_right, a_right_height = cls._expose(a, a_height)
+        b_left, b_left_height, _, b_right, b_right_height = cls._split_root(b, b_height, a.value)
+        left = cls._union_roots(a_left, a_left_height, b_left, b_left_height)
+        right = cls._union_roots(a_right, a_right_height, b_right, b_right_height)
+        return cls._join_roots(*left, a, *right)
+
+    @classmethod
+    def _intersection_roots(cls, a, a_height, b, b_height):
+        if a is RB_NIL or b is RB_NIL:
+            return RB_NIL, 0
+        if a.size > b.size:
+            a, a_height, b, b_height = b, b_height, a, a_height
+        a_left, a_left_height, a_right, a_right_height = cls._expose(a, a_height)
+        b_left, b_left_height, found, b_right, b_right_height = cls._split_root(b, b_height, a.value)
+        left = cls._intersection_roots(a_left, a_left_height, b_left, b_left_height)
+        right = cls._intersection_roots(a_right, a_right_height, b_right, b_right_height)
+        if found:
+            return cls._join_roots(*left, a, *right)
+        return cls._join2_roots(*left, *right)
+
+    @classmethod
+    def _difference_roots(cls, a, a_height, b, b_height):
+        if a is RB_NIL:
+            return RB_NIL, 0
+        if b is RB_NIL:
+            return a, a_height
+        b_left, b_left_height, b_right, b_right_height = cls._expose(b, b_height)
+        a_left, a_left_height, _, a_right, a_right_height = cls._split_root(a, a_height, b.value)
+        left = cls._difference_roots(a_left, a_left_height, b_left, b_left_height)
+        right = cls._difference_roots(a_right, a_right_height, b_right, b_right_height)
+        return cls._join2_roots(*left, *right)
+
+    # quantidade de chaves menores que value
+    def rank(self, value):
+        count = 0
+        current = self.root
+        while current is not RB_NIL:
+            if value <= current.value:
+                current = current.left
+            else:
+                count += current.left.size + 1
+                current = current.right
+        return count
+
+    # k-ésima menor chave (k começa em 0)
+    def select(self, k):
+        if k < 0 or k >= self.root.size:
+            raise IndexError("índice fora do intervalo da árvore")
+        current = self.root
+        while True:
+            left_size = current.left.size
+            if k < left_size:
+                current = current.left
+            elif k == left_size:
+                return current.value
+            else:
+                k -= left_size + 1
+                current = current.right
+
+    # quantidade de chaves em [lo, hi]
+    def count_range(self, lo, hi):
+        if hi < lo:
+            return 0
+        count = self.rank(hi) - self.rank(lo)
+        if self.search(hi):
+            count += 1
+        return count
+
+    def __len__(self):
+        return self.root.size
 
     def _minimum(self, node):
-        while node.left:
+        while node.left is not RB_NIL:
             node = node.left
         return node
     
     # realiza a troca
     def _transplant(self, u, v):
-        if not u.parent:
+        if u.parent is RB_NIL:
             self.root = v
-        elif u == u.parent.left:
+        elif u is u.parent.left:
             u.parent.left = v
         else:
             u.parent.right = v
-        if v:
+        if v is not RB_NIL:
             v.parent = u.parent
 
-# ==================== 2-3-4 TREE ====================
+# ==================== RED-BLACK TREE (ARENA) ====================
+# Mesma árvore rubro-negra, mas os nós vivem em arrays paralelos indexados por
+# inteiros: chaves, filhos, pai e cor. O índice 0 é a sentinela NIL e posições
+# removidas entram numa lista livre (encadeada pelo array left) para reuso.
+class RBArenaTree:
+    def __init__(self, typecode='q'):
+        self._keys = array(typecode, [0])
+        self._left = array('I', [0])
+        self._right = array('I', [0])
+        self._parent = array('I', [0])
+        self._color = bytearray([BLACK])
+        self._free = 0
+        self._count = 0
+        self.root = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, value):
+        return self.search(value) is not None
+
+    # aloca um índice, reaproveitando a lista livre
+    def _new_node(self, value):
+        index = self._free
+        if index:
+            self._free = self._left[index]
+            self._keys[index] = value
+            self._left[index] = 0
+            self._right[index] = 0
+            self._parent[index] = 0
+            self._color[index] = RED
+        else:
+            index = len(self._keys)
+            self._keys.append(value)
+            self._left.append(0)
+            self._right.append(0)
+            self._parent.append(0)
+            self._color.append(RED)
+        return index
+
+    def _release(self, index):
+        self._left[index] = self._free
+        self._free = index
+
+    # função de busca: devolve o índice do nó ou None
+    def search(self, value):
+        keys, left, right = self._keys, self._left, self._right
+        current = self.root
+        while current:
+            key = keys[current]
+            if value == key:
+                return current
+            current = left[current] if value < key else right[current]
+        return None
+
+    # inserção
+    def insert(self, value):
+        keys, left, right = self._keys, self._left, self._right
+        parent = 0
+        current = self.root
+        while current:
+            parent = current
+            key = keys[current]
+            if value < key:
+                current = left[current]
+            elif value > key:
+                current = right[current]
+            else:
+                return  # Duplicate
+
+        node = self._new_node(value)
+        self._parent[node] = parent
+        if not parent:
+            self.root = node
+        elif value < keys[parent]:
+            left[parent] = node
+        else:
+            right[parent] = node
+        self._count += 1
+        self._fix_insert(node)
+
+    def _fix_insert(self, node):
+        left, right, parent, color = self._left, self._right, self._parent, self._color
+        while color[parent[node]] == RED:
+            p = parent[node]
+            g = parent[p]
+            if p == left[g]:
+                uncle = right[g]
+                if color[uncle] == RED:
+                    color[p] = BLACK
+                    color[uncle] = BLACK
+                    color[g] = RED
+                    node = g
+                else:
+                    if node == right[p]:
+                        node = p
+                        self._rotate_left(node)
+                        p = parent[node]
+                    color[p] = BLACK
+                    color[g] = RED
+                    self._rotate_right(g)
+            else:
+                uncle = left[g]
+                if color[uncle] == RED:
+                    color[p] = BLACK
+                    color[uncle] = BLACK
+                    color[g] = RED
+                    node = g
+                else:
+                    if node == left[p]:
+                        node = p
+                        self._rotate_right(node)
+                        p = parent[node]
+                    color[p] = BLACK
+                    color[g] = RED
+                    self._rotate_left(g)
+        color[self.root] = BLACK
+
+    def _rotate_left(self, node):
+        left, right, parent = self._left, self._right, self._parent
+        child = right[node]
+        right[node] = left[child]
+        if left[child]:
+            parent[left[child]] = node
+        up = parent[node]
+        parent[child] = up
+        if not up:
+            self.root = child
+        elif node == left[up]:
+            left[up] = child
+        else:
+            right[up] = child
+        left[child] = node
+        parent[node] = child
+
+    def _rotate_right(self, node):
+        left, right, parent = self._left, self._right, self._parent
+        child = left[node]
+        left[node] = right[child]
+        if right[child]:
+            parent[right[child]] = node
+        up = parent[node]
+        parent[child] = up
+        if not up:
+            self.root = child
+        elif node == right[up]:
+            right[up] = child
+        else:
+            left[up] = child
+        right[child] = node
+        parent[node] = child
+
+    def _transplant(self, u, v):
+        left, right, parent = self._left, self._right, self._parent
+        up = parent[u]
+        if not up:
+            self.root = v
+        elif u == left[up]:
+            left[up] = v
+        else:
+            right[up] = v
+        parent[v] = up
+
+    # verificar remoção
+    def delete(self, value):
+        node = self.search(value)
+        if node is None:
+            return
+        left, right, parent, color = self._left, self._right, self._parent, self._color
+
+        y = node
+        y_original_color = color[y]
+        if not left[node]:
+            x = right[node]
+            self._transplant(node, x)
+        elif not right[node]:
+            x = left[node]
+            self._transplant(node, x)
+        else:
+            y = right[node]
+            while left[y]:
+                y = left[y]
+            y_original_color = color[y]
+            x = right[y]
+            if parent[y] == node:
+                parent[x] = y
+            else:
+                self._transplant(y, right[y])
+                right[y] = right[node]
+                parent[right[y]] = y
+            self._transplant(node, y)
+            left[y] = left[node]
+            parent[left[y]] = y
+            color[y] = color[node]
+
+        if y_original_color == BLACK:
+            self._fix_delete(x)
+        # a sentinela pode ter recebido um pai durante a correção
+        parent[0] = 0
+        self._release(node)
+        self._count -= 1
+
+    def _fix_delete(self, node):
+        left, right, parent, color = self._left, self._right, self._parent, self._color
+        while node != self.root and color[node] == BLACK:
+            p = parent[node]
+            if node == left[p]:
+                sibling = right[p]
+                if color[sibling] == RED:
+                    color[sibling] = BLACK
+                    color[p] = RED
+                    self._rotate_left(p)
+                    sibling = right[p]
+                if color[left[sibling]] == BLACK and color[right[sibling]] == BLACK:
+                    color[sibling] = RED
+                    node = p
+                else:
+                    if color[right[sibling]] == BLACK:
+                        color[left[sibling]] = BLACK
+                        color[sibling] = RED
+                        self._rotate_right(sibling)
+                        sibling = right[p]
+                    color[sibling] = color[p]
+                    color[p] = BLACK
+                    color[right[sibling]] = BLACK
+                    self._rotate_left(p)
+                    node = self.root
+            else:
+                sibling = left[p]
+                if color[sibling] == RED:
+                    color[sibling] = BLACK
+                    color[p] = RED
+                    self._rotate_right(p)
+                    sibling = left[p]
+                if color[right[sibling]] == BLACK and color[left[sibling]] == BLACK:
+                    color[sibling] = RED
+                    node = p
+                else:
+                    if color[left[sibling]] == BLACK:
+                        color[right[sibling]] = BLACK
+                        color[sibling] = RED
+                        self._rotate_left(sibling)
+                        sibling = left[p]
+                    color[sibling] = color[p]
+                    color[p] = BLACK
+                    color[left[sibling]] = BLACK
+                    self._rotate_right(p)
+                    node = self.root
+        color[node] = BLACK
+
+# ==================== RED-BLACK TREE (PERSISTENTE) ====================
+# Versão com cópia sob escrita: snapshot() é O(1) e congela todos os nós atuais.
+# Cada nó guarda a versão em que foi criado; escritas copiam apenas os nós
+# congelados do caminho (e os poucos vizinhos tocados pelas rotações). Sem
+# ponteiro para o pai, já que ele obrigaria a copiar a árvore inteira; o caminho
+# fica numa pilha. Versões antigas são liberadas pelo coletor quando o último
+# snapshot que as referencia deixa de existir.
+class PRBNode:
+    __slots__ = ('value', 'left', 'right', 'color', 'version')
+
+    def __init__(self, value, version, color=RED, left=None, right=None):
+        self.value = value
+        self.left = left
+        self.right = right
+        self.color = color
+        self.version = version
+
+class _PersistentRBReader:
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, value):
+        return self.search(value) is not None
+
+    # função de busca
+    def search(self, value):
+        current = self.root
+        while current:
+            if value == current.value:
+                return current
+            current = current.left if value < current.value else current.right
+        return None
+
+    def __iter__(self):
+        stack = []
+        current = self.root
+        while stack or current:
+            while current:
+                stack.append(current)
+                current = current.left
+            current = stack.pop()
+            yield current.value
+            current = current.right
+
+class RBSnapshot(_PersistentRBReader):
+    """Visão somente leitura de uma versão de PersistentRedBlackTree."""
+    def __init__(self, root, count):
+        self.root = root
+        self._count = count
+
+class PersistentRedBlackTree(_PersistentRBReader):
+    def __init__(self):
+        self.root = None
+        self._count = 0
+        self._version = 0
+
+    # O(1): a partir daqui os nós existentes passam a ser imutáveis
+    def snapshot(self):
+        self._version += 1
+        return RBSnapshot(self.root, self._count)
+
+    # devolve uma cópia gravável do nó (ou o próprio, se já é da versão atual)
+    def _own(self, node):
+        if node is None or node.version == self._version:
+            return node
+        return PRBNode(node.value, self._version, node.color, node.left, node.right)
+
+    def _replace_child(self, parent, old, new):
+        if parent is None:
+            self.root = new
+        elif parent.left is old:
+            parent.left = new
+        else:
+            parent.right = new
+
+    # rotações exigem node e o filho que sobe já graváveis
+    def _rotate_left(self, node, parent):
+        right = node.right
+        node.right = right.left
+        right.left = node
+        self._replace_child(parent, node, right)
+        return right
+
+    def _rotate_right(self, node, parent):
+        left = node.left
+        node.left = left.right
+        left.right = node
+        self._replace_child(parent, node, left)
+        return left
+
+    # copia o caminho até o nó alvo, de cima para baixo
+    def _own_path(self, path):
+        owned = []
+        parent = None
+        for node in path:
+            copy = self._own(node)
+            if copy is not node:
+                self._replace_child(parent, node, copy)
+            owned.append(copy)
+            parent = copy
+        return owned
+
+    # inserção
+    def insert(self, value):
+        path = []
+        current = self.root
+        while current:
+            path.append(current)
+            if value < current.value:
+                current = current.left
+            elif value > current.value:
+                current = current.right
+            else:
+                return  # Duplicate
+
+        path = self._own_path(path)
+        node = PRBNode(value, self._version)
+        if not path:
+            self.root = node
+        elif value < path[-1].value:
+            path[-1].left = node
+        else:
+            path[-1].right = node
+        self._count += 1
+        self._fix_insert(node, path)
+
+    def _fix_insert(self, node, path):
+        i = len(path) - 1
+        while i >= 1 and path[i].color is RED:
+            parent = path[i]
+            grandparent = path[i - 1]
+            great = path[i - 2] if i >= 2 else None
+            if parent is grandparent.left:
+                uncle = grandparent.right
+                if uncle and uncle.color is RED:
+                    uncle = self._own(uncle)
+                    grandparent.right = uncle
+                    parent.color = BLACK
+                    uncle.color = BLACK
+                    grandparent.color = RED
+                    node = grandparent
+                    i -= 2
+                    continue
+                if node is parent.right:
+                    self._rotate_left(parent, grandparent)
+                    parent = node
+                parent.color = BLACK
+                grandparent.color = RED
+                self._rotate_right(grandparent, great)
+            else:
+                uncle = grandparent.left
+                if uncle and uncle.color is RED:
+                    uncle = self._own(uncle)
+                    grandparent.left = uncle
+                    parent.color = BLACK
+                    uncle.color = BLACK
+                    grandparent.color = RED
+                    node = grandparent
+                    i -= 2
+                    continue
+                if node is parent.left:
+                    self._rotate_right(parent, grandparent)
+                    parent = node
+                parent.color = BLACK
+                grandparent.color = RED
+                self._rotate_left(grandparent, great)
+            break
+        if self.root.color is RED:
+            self.root = self._own(self.root)
+            self.root.color = BLACK
+
+    # verificar remoção
+    def delete(self, value):
+        path = []
+        current = self.root
+        while current and current.value != value:
+            path.append(current)
+            current = current.left if value < current.value else current.right
+        if not current:
+            return
+        path.append(current)
+        target = len(path) - 1
+
+        # com dois filhos, o sucessor toma o lugar do valor e é ele quem sai
+        if current.left and current.right:
+            successor = current.right
+            path.append(successor)
+            while successor.left:
+                successor = successor.left
+                path.append(successor)
+
+        path = self._own_path(path)
+        removed = path.pop()
+        if len(path) > target:
+            path[target].value = removed.value
+
+        child = removed.left or removed.right
+        parent = path[-1] if path else None
+        self._count -= 1
+        if child and child.color is RED:
+            child = self._own(child)
+            child.color = BLACK
+            self._replace_child(parent, removed, child)
+            return
+        self._replace_child(parent, removed, child)
+        if removed.color is BLACK:
+            self._fix_delete(child, path)
+
+    # corrige o duplo-preto em x; path contém os ancestrais graváveis de x
+    def _fix_delete(self, node, path):
+        i = len(path) - 1
+        while i >= 0 and (node is None or node.color is BLACK):
+            parent = path[i]
+            grandparent = path[i - 1] if i >= 1 else None
+            if node is parent.left:
+                sibling = self._own(parent.right)
+                parent.right = sibling
+                # Caso 1: irmão vermelho
+                if sibling.color is RED:
+                    sibling.color = BLACK
+                    parent.color = RED
+                    self._rotate_left(parent, grandparent)
+                    path.insert(i, sibling)
+                    grandparent = sibling
+                    i += 1
+                    sibling = self._own(parent.right)
+                    parent.right = sibling
+                # Caso 2: irmão preto com filhos pretos
+                if self._is_black(sibling.left) and self._is_black(sibling.right):
+                    sibling.color = RED
+                    node = parent
+                    i -= 1
+                    continue
+                # Caso 3: irmão preto com filho próximo vermelho
+                if self._is_black(sibling.right):
+                    sibling.left = self._own(sibling.left)
+                    sibling.left.color = BLACK
+                    sibling.color = RED
+                    sibling = self._rotate_right(sibling, parent)
+                # Caso 4: irmão preto com filho distante vermelho
+                sibling.right = self._own(sibling.right)
+                sibling.color = parent.color
+                parent.color = BLACK
+                sibling.right.color = BLACK
+                self._rotate_left(parent, grandparent)
+            else:
+                sibling = self._own(parent.left)
+                parent.left = sibling
+                if sibling.color is RED:
+                    sibling.color = BLACK
+                    parent.color = RED
+                    self._rotate_right(parent, grandparent)
+                    path.insert(i, sibling)
+                    grandparent = sibling
+                    i += 1
+                    sibling = self._own(parent.left)
+                    parent.left = sibling
+                if self._is_black(sibling.right) and self._is_black(sibling.left):
+                    sibling.color = RED
+                    node = parent
+                    i -= 1
+                    continue
+                if self._is_black(sibling.left):
+                    sibling.right = self._own(sibling.right)
+                    sibling.right.color = BLACK
+                    sibling.color = RED
+                    sibling = self._rotate_left(sibling, parent)
+                sibling.left = self._own(sibling.left)
+                sibling.color = parent.color
+                parent.color = BLACK
+                sibling.left.color = BLACK
+                self._rotate_right(parent, grandparent)
+            return
+        # nós do caminho já são graváveis
+        if node:
+            node.color = BLACK
+
+    def _is_black(self, node):
+        return node is None or node.color is BLACK
+
+# ==================== B-TREE / 2-3-4 TREE ====================
 class Node234:
     def __init__(self):
         self.keys = []
@@ -283,55 +1253,115 @@ class Node234:
     
     def is_leaf(self):
         return len(self.children) == 0
-    
-    def is_full(self):
-        return len(self.keys) == 3
 
-class Tree234:
-    def __init__(self):
+# árvore B de ordem m: até m filhos e m - 1 chaves por nó; busca binária dentro do nó
+class BTree:
+    def __init__(self, order=4):
+        if order < 3:
+            raise ValueError("a ordem da árvore B deve ser pelo menos 3")
+        self.order = order
+        self.max_keys = order - 1
+        self.min_keys = (order + 1) // 2 - 1
         self.root = Node234()
     
-    def insert(self, value):
-        if self.root.is_full():
-            new_root = Node234()
-            new_root.children.append(self.root)
-            self.root.parent = new_root
-            self._split_child(new_root, 0)
-            self.root = new_root
-        self._insert_non_full(self.root, value)
+    # construção em O(n) a partir de chaves ordenadas: folhas preenchidas até
+    # fill_factor e níveis internos montados de baixo para cima numa só passada
+    @classmethod
+    def from_sorted(cls, iterable, fill_factor=1.0, **kwargs):
+        if not 0 < fill_factor <= 1:
+            raise ValueError("fill_factor deve estar no intervalo (0, 1]")
+        tree = cls(**kwargs)
+        values = []
+        for value in iterable:
+            if values:
+                if value < values[-1]:
+                    raise ValueError("from_sorted exige valores em ordem crescente")
+                if value == values[-1]:
+                    continue  # Duplicate
+            values.append(value)
+        if not values:
+            return tree
+        
+        capacity = min(tree.max_keys, max(tree.min_keys, 1, round(fill_factor * tree.max_keys)))
+        
+        # folhas: n = chaves nas folhas + separadores entre elas
+        n = len(values)
+        count = max(1, (n + 1) // (capacity + 1))
+        while -(-(n - count + 1) // count) > tree.max_keys:
+            count += 1
+        base, extra = divmod(n - count + 1, count)
+        nodes, separators = [], []
+        pos = 0
+        for i in range(count):
+            leaf = Node234()
+            size = base + (1 if i < extra else 0)
+            leaf.keys = values[pos:pos + size]
+            pos += size
+            nodes.append(leaf)
+            if i < count - 1:
+                separators.append(values[pos])
+                pos += 1
+        
+        # níveis internos: agrupa os nós do nível de baixo entre novos pais
+        fanout = capacity + 1
+        while len(nodes) > 1:
+            total = len(nodes)
+            count = max(1, total // fanout)
+            while -(-total // count) > tree.order:
+                count += 1
+            base, extra = divmod(total, count)
+            parents, parent_separators = [], []
+            pos = 0
+            for i in range(count):
+                parent = Node234()
+                size = base + (1 if i < extra else 0)
+                parent.children = nodes[pos:pos + size]
+                parent.keys = separators[pos:pos + size - 1]
+                for child in parent.children:
+                    child.parent = parent
+                pos += size
+                parents.append(parent)
+                if i < count - 1:
+                    parent_separators.append(separators[pos - 1])
+            nodes, separators = parents, parent_separators
+        
+        tree.root = nodes[0]
+        return tree
     
-    def _insert_non_full(self, node, value):
-        i = len(node.keys) - 1
-        
-        if node.is_leaf():
-            node.keys.append(0)
-            while i >= 0 and value < node.keys[i]:
-                node.keys[i + 1] = node.keys[i]
-                i -= 1
-            node.keys[i + 1] = value
-        else:
-            while i >= 0 and value < node.keys[i]:
-                i -= 1
-            i += 1
-            
-            if node.children[i].is_full():
-                self._split_child(node, i)
-                if value > node.keys[i]:
-                    i += 1
-            self._insert_non_full(node.children[i], value)
+    # inserção na folha; nós que passam de max_keys são divididos de baixo para cima
+    def insert(self, value):
+        path = []
+        node = self.root
+        while not node.is_leaf():
+            i = bisect_right(node.keys, value)
+            path.append((node, i))
+            node = node.children[i]
+        node.keys.insert(bisect_right(node.keys, value), value)
+        
+        while len(node.keys) > self.max_keys:
+            if path:
+                parent, index = path.pop()
+            else:
+                parent, index = Node234(), 0
+                parent.children.append(node)
+                node.parent = parent
+                self.root = parent
+            self._split_child(parent, index)
+            node = parent
     
     def _split_child(self, parent, index):
         full_node = parent.children[index]
         new_node = Node234()
         new_node.parent = parent
         
-        mid_key = full_node.keys[1]
-        new_node.keys = [full_node.keys[2]]
-        full_node.keys = [full_node.keys[0]]
+        mid = len(full_node.keys) // 2
+        mid_key = full_node.keys[mid]
+        new_node.keys = full_node.keys[mid + 1:]
+        del full_node.keys[mid:]
         
         if not full_node.is_leaf():
-            new_node.children = [full_node.children[2], full_node.children[3]]
-            full_node.children = [full_node.children[0], full_node.children[1]]
+            new_node.children = full_node.children[mid + 1:]
+            del full_node.children[mid + 1:]
             for child in new_node.children:
                 child.parent = new_node
         
@@ -342,113 +1372,724 @@ class Tree234:
         if node is None:
             node = self.root
         
-        i = 0
-        while i < len(node.keys) and value > node.keys[i]:
-            i += 1
-        
-        if i < len(node.keys) and value == node.keys[i]:
-            return node
-        if node.is_leaf():
-            return None
-        return self.search(value, node.children[i])
+        while True:
+            i = bisect_left(node.keys, value)
+            if i < len(node.keys) and value == node.keys[i]:
+                return node
+            if node.is_leaf():
+                return None
+            node = node.children[i]
     
     def delete(self, value):
         if not self.root:
             return
-        self._delete_from_node(self.root, value)
-        if len(self.root.keys) == 0 and len(self.root.children) > 0:
-            self.root = self.root.children[0]
-            self.root.parent = None
+        # a fusão antecipada só cabe num nó quando max_keys é ímpar (ordem par)
+        if self.max_keys % 2 == 1:
+            self._delete_top_down(value)
+        else:
+            self._delete_bottom_up(value)
     
-    def _delete_from_node(self, node, value):
-        i = 0
-        while i < len(node.keys) and value > node.keys[i]:
-            i += 1
-        
-        if i < len(node.keys) and value == node.keys[i]:
+    # remoção 2-3-4 clássica em uma única descida: antes de descer, garante que o
+    # filho tenha uma chave sobrando; chaves internas são trocadas pelo predecessor
+    # (ou sucessor) que é retirado da folha ao fim da mesma descida
+    def _delete_top_down(self, value):
+        node = self.root
+        holder = None
+        take_max = False
+        
+        while True:
+            if holder is None:
+                i = bisect_left(node.keys, value)
+                found = i < len(node.keys) and node.keys[i] == value
+                if node.is_leaf():
+                    if found:
+                        node.keys.pop(i)
+                    return
+                if not found:
+                    node = self._descend_with_spare(node, i)
+                    continue
+                if len(node.children[i].keys) > self.min_keys:
+                    holder, take_max = (node, i), True
+                    node = node.children[i]
+                elif len(node.children[i + 1].keys) > self.min_keys:
+                    holder, take_max = (node, i), False
+                    node = node.children[i + 1]
+                else:
+                    node = self._merge_children(node, i)
+                continue
+            
+            if node.is_leaf():
+                holder_node, index = holder
+                holder_node.keys[index] = node.keys.pop() if take_max else node.keys.pop(0)
+                return
+            node = self._descend_with_spare(node, len(node.children) - 1 if take_max else 0)
+    
+    def _descend_with_spare(self, parent, index):
+        child = parent.children[index]
+        if len(child.keys) > self.min_keys:
+            return child
+        if index > 0 and len(parent.children[index - 1].keys) > self.min_keys:
+            self._borrow_from_left(parent, index)
+            return child
+        if index < len(parent.children) - 1 and len(parent.children[index + 1].keys) > self.min_keys:
+            self._borrow_from_right(parent, index)
+            return child
+        if index == len(parent.children) - 1:
+            index -= 1
+        return self._merge_children(parent, index)
+    
+    # para ordens ímpares: desce uma vez guardando o caminho e corrige de baixo para cima
+    def _delete_bottom_up(self, value):
+        path = []
+        node = self.root
+        while True:
+            i = bisect_left(node.keys, value)
+            if i < len(node.keys) and node.keys[i] == value:
+                break
             if node.is_leaf():
-                node.keys.pop(i)
+                return
+            path.append((node, i))
+            node = node.children[i]
+        
+        if node.is_leaf():
+            node.keys.pop(i)
+        else:
+            holder = node
+            path.append((node, i))
+            node = node.children[i]
+            while not node.is_leaf():
+                path.append((node, len(node.children) - 1))
+                node = node.children[-1]
+            holder.keys[i] = node.keys.pop()
+        
+        while path and len(node.keys) < self.min_keys:
+            parent, index = path.pop()
+            if index > 0 and len(parent.children[index - 1].keys) > self.min_keys:
+                self._borrow_from_left(parent, index)
+            elif index < len(parent.children) - 1 and len(parent.children[index + 1].keys) > self.min_keys:
+                self._borrow_from_right(parent, index)
             else:
-                pred = self._get_predecessor(node, i)
-                node.keys[i] = pred
-                self._delete_from_node(node.children[i], pred)
-                self._fix_child(node, i)
-        elif not node.is_leaf() and i < len(node.children):
-            self._delete_from_node(node.children[i], value)
-            self._fix_child(node, i)
-    
-    def _fix_child(self, parent, index):
+                self._merge_children(parent, index - 1 if index == len(parent.children) - 1 else index)
+            node = parent
+    
+    def _borrow_from_left(self, parent, index):
         child = parent.children[index]
+        left_sibling = parent.children[index - 1]
+        child.keys.insert(0, parent.keys[index - 1])
+        parent.keys[index - 1] = left_sibling.keys.pop()
+        if not left_sibling.is_leaf():
+            moved = left_sibling.children.pop()
+            moved.parent = child
+            child.children.insert(0, moved)
+    
+    def _borrow_from_right(self, parent, index):
+        child = parent.children[index]
+        right_sibling = parent.children[index + 1]
+        child.keys.append(parent.keys[index])
+        parent.keys[index] = right_sibling.keys.pop(0)
+        if not right_sibling.is_leaf():
+            moved = right_sibling.children.pop(0)
+            moved.parent = child
+            child.children.append(moved)
+    
+    # funde children[index], keys[index] e children[index + 1]; a raiz vazia desce
+    def _merge_children(self, parent, index):
+        child = parent.children[index]
+        right_sibling = parent.children.pop(index + 1)
+        child.keys.append(parent.keys.pop(index))
+        child.keys.extend(right_sibling.keys)
+        for moved in right_sibling.children:
+            moved.parent = child
+        child.children.extend(right_sibling.children)
+        if parent is self.root and not parent.keys:
+            self.root = child
+            child.parent = None
+        return child
+
+# árvore 2-3-4: caso particular da árvore B com ordem 4
+class Tree234(BTree):
+    def __init__(self):
+        super().__init__(order=4)
 
-        if len(child.keys) > 0:
+# ==================== B+ TREE ====================
+# Todas as chaves ficam nas folhas, encadeadas por next/prev; os nós internos
+# guardam só separadores (o filho i cobre chaves em [keys[i-1], keys[i])).
+class BPlusNode(Node234):
+    def __init__(self):
+        super().__init__()
+        self.next = None
+        self.prev = None
+
+class BPlusTree:
+    def __init__(self, order=4):
+        if order < 3:
+            raise ValueError("a ordem da árvore B+ deve ser pelo menos 3")
+        self.order = order
+        self.max_keys = order - 1
+        self.min_keys = (order + 1) // 2 - 1
+        self.root = BPlusNode()
+        self._count = 0
+    
+    def __len__(self):
+        return self._count
+    
+    def __contains__(self, value):
+        return self.search(value) is not None
+    
+    def __iter__(self):
+        leaf = self._leftmost_leaf()
+        while leaf:
+            yield from leaf.keys
+            leaf = leaf.next
+    
+    # desce até a folha que conteria value, guardando (nó, índice do filho)
+    def _find_leaf(self, value, path=None):
+        node = self.root
+        while not node.is_leaf():
+            i = bisect_right(node.keys, value)
+            if path is not None:
+                path.append((node, i))
+            node = node.children[i]
+        return node
+    
+    def _leftmost_leaf(self):
+        node = self.root
+        while not node.is_leaf():
+            node = node.children[0]
+        return node
+    
+    # função de busca: devolve a folha que contém value
+    def search(self, value):
+        leaf = self._find_leaf(value)
+        i = bisect_left(leaf.keys, value)
+        if i < len(leaf.keys) and leaf.keys[i] == value:
+            return leaf
+        return None
+    
+    # uma descida até lo e depois leitura sequencial das folhas encadeadas
+    def range(self, lo=None, hi=None, inclusive=(True, True)):
+        lo_inclusive, hi_inclusive = inclusive
+        if lo is None:
+            leaf, i = self._leftmost_leaf(), 0
+        else:
+            leaf = self._find_leaf(lo)
+            i = bisect_left(leaf.keys, lo) if lo_inclusive else bisect_right(leaf.keys, lo)
+        while leaf:
+            keys = leaf.keys
+            if hi is not None and keys and (keys[-1] > hi or (keys[-1] == hi and not hi_inclusive)):
+                end = bisect_right(keys, hi) if hi_inclusive else bisect_left(keys, hi)
+                yield from keys[i:end]
+                return
+            yield from keys[i:]
+            leaf, i = leaf.next, 0
+    
+    # inserção
+    def insert(self, value):
+        path = []
+        leaf = self._find_leaf(value, path)
+        i = bisect_left(leaf.keys, value)
+        if i < len(leaf.keys) and leaf.keys[i] == value:
+            return  # Duplicate
+        leaf.keys.insert(i, value)
+        self._count += 1
+        if len(leaf.keys) <= self.max_keys:
+            return
+        
+        # divide a folha: o separador é uma cópia da primeira chave da nova folha
+        new_leaf = BPlusNode()
+        mid = len(leaf.keys) // 2
+        new_leaf.keys = leaf.keys[mid:]
+        del leaf.keys[mid:]
+        new_leaf.next = leaf.next
+        new_leaf.prev = leaf
+        if leaf.next:
+            leaf.next.prev = new_leaf
+        leaf.next = new_leaf
+        self._insert_in_parent(path, leaf, new_leaf.keys[0], new_leaf)
+    
+    def _insert_in_parent(self, path, node, separator, new_node):
+        while True:
+            if not path:
+                new_root = BPlusNode()
+                new_root.keys = [separator]
+                new_root.children = [node, new_node]
+                node.parent = new_node.parent = new_root
+                self.root = new_root
+                return
+            parent, index = path.pop()
+            parent.keys.insert(index, separator)
+            parent.children.insert(index + 1, new_node)
+            new_node.parent = parent
+            if len(parent.keys) <= self.max_keys:
+                return
+            
+            # divide o nó interno: o separador do meio sobe
+            sibling = BPlusNode()
+            mid = len(parent.keys) // 2
+            separator = parent.keys[mid]
+            sibling.keys = parent.keys[mid + 1:]
+            sibling.children = parent.children[mid + 1:]
+            del parent.keys[mid:]
+            del parent.children[mid + 1:]
+            for child in sibling.children:
+                child.parent = sibling
+            node, new_node = parent, sibling
+    
+    # verificar remoção
+    def delete(self, value):
+        path = []
+        node = self._find_leaf(value, path)
+        i = bisect_left(node.keys, value)
+        if i >= len(node.keys) or node.keys[i] != value:
             return
+        node.keys.pop(i)
+        self._count -= 1
+        
+        while path and len(node.keys) < self.min_keys:
+            parent, index = path.pop()
+            left = parent.children[index - 1] if index > 0 else None
+            right = parent.children[index + 1] if index < len(parent.children) - 1 else None
+            if node.is_leaf():
+                if left and len(left.keys) > self.min_keys:
+                    node.keys.insert(0, left.keys.pop())
+                    parent.keys[index - 1] = node.keys[0]
+                elif right and len(right.keys) > self.min_keys:
+                    node.keys.append(right.keys.pop(0))
+                    parent.keys[index] = right.keys[0]
+                elif left:
+                    self._merge_leaves(parent, index - 1)
+                else:
+                    self._merge_leaves(parent, index)
+            else:
+                if left and len(left.keys) > self.min_keys:
+                    node.keys.insert(0, parent.keys[index - 1])
+                    parent.keys[index - 1] = left.keys.pop()
+                    moved = left.children.pop()
+                    moved.parent = node
+                    node.children.insert(0, moved)
+                elif right and len(right.keys) > self.min_keys:
+                    node.keys.append(parent.keys[index])
+                    parent.keys[index] = right.keys.pop(0)
+                    moved = right.children.pop(0)
+                    moved.parent = node
+                    node.children.append(moved)
+                elif left:
+                    self._merge_internal(parent, index - 1)
+                else:
+                    self._merge_internal(parent, index)
+            node = parent
+        
+        if not self.root.is_leaf() and not self.root.keys:
+            self.root = self.root.children[0]
+            self.root.parent = None
+    
+    # funde a folha index com a seguinte; o separador entre elas desaparece
+    def _merge_leaves(self, parent, index):
+        leaf = parent.children[index]
+        right = parent.children.pop(index + 1)
+        parent.keys.pop(index)
+        leaf.keys.extend(right.keys)
+        leaf.next = right.next
+        if right.next:
+            right.next.prev = leaf
+    
+    # funde o nó interno index com o seguinte, trazendo o separador para baixo
+    def _merge_internal(self, parent, index):
+        node = parent.children[index]
+        right = parent.children.pop(index + 1)
+        node.keys.append(parent.keys.pop(index))
+        node.keys.extend(right.keys)
+        for child in right.children:
+            child.parent = node
+        node.children.extend(right.children)
 
-        if index > 0 and len(parent.children[index - 1].keys) > 1:
-            left_sibling = parent.children[index - 1]
+# ==================== B-TREE EM DISCO ====================
+# Árvore B persistente em um único arquivo de páginas de tamanho fixo. A página 0
+# é o cabeçalho; as demais guardam um nó cada (chaves inteiras de 64 bits e ids
+# de páginas filhas). O acesso passa por um pool LRU limitado: páginas sujas são
+# gravadas ao sair do pool ou em flush(). Reabrir o arquivo lê só o cabeçalho.
+# Inserção e remoção são top-down (uma descida), por isso a ordem é sempre par.
+class DiskPage:
+    __slots__ = ('page_id', 'leaf', 'keys', 'children', 'dirty')
 
-            child.keys.insert(0, parent.keys[index - 1])
+    def __init__(self, page_id, leaf, keys=None, children=None):
+        self.page_id = page_id
+        self.leaf = leaf
+        self.keys = keys if keys is not None else []
+        self.children = children if children is not None else []
+        self.dirty = False
 
-            parent.keys[index - 1] = left_sibling.keys.pop()
+    def is_leaf(self):
+        return self.leaf
 
-            if not left_sibling.is_leaf():
-                child.children.insert(0, left_sibling.children.pop())
+class DiskBTree:
+    MAGIC = b'PTBTREE1'
+    _HEADER = struct.Struct('<8sIIqqqq')  # magic, page_size, order, root, pages, free, count
+    _NODE_HEADER = struct.Struct('<BH')   # folha?, número de chaves
+    _FREE = struct.Struct('<Bq')          # marca de página livre, próxima livre
+    _FREE_MARK = 0xFF
+    KEY_MIN, KEY_MAX = -2**63, 2**63 - 1  # chaves são gravadas como int64 ('q')
 
-            return
+    def __init__(self, path, page_size=4096, order=None, cache_pages=256):
+        if cache_pages < 8:
+            raise ValueError("o pool precisa de pelo menos 8 páginas")
+        self.path = path
+        self.cache_pages = cache_pages
+        self._pool = OrderedDict()
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        if exists:
+            raw = os.pread(self._fd, self._HEADER.size, 0)
+            magic, page_size, order, self._root_id, self._page_count, self._free_head, self._count = \
+                self._HEADER.unpack(raw)
+            if magic != self.MAGIC:
+                os.close(self._fd)
+                raise ValueError(f"{path} não é um arquivo de DiskBTree")
+            self._configure(page_size, order)
+            self._meta_dirty = False
+        else:
+            largest = (page_size - self._NODE_HEADER.size - 8) // 16 + 1
+            largest -= largest % 2
+            if order is None:
+                order = largest
+            if order < 4 or order % 2 or order > largest:
+                raise ValueError(f"ordem deve ser par, entre 4 e {largest} para páginas de {page_size} bytes")
+            self._configure(page_size, order)
+            self._page_count = 1
+            self._free_head = 0
+            self._count = 0
+            root = self._allocate(leaf=True)
+            self._root_id = root.page_id
+            self._meta_dirty = True
+            self.flush()
+
+    def _configure(self, page_size, order):
+        self.page_size = page_size
+        self.order = order
+        self.max_keys = order - 1
+        self.min_keys = order // 2 - 1
+        self._keys_struct = struct.Struct(f'<{self.max_keys}q')
+        self._children_struct = struct.Struct(f'<{order}q')
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, value):
+        return self.search(value) is not None
 
-        if index < len(parent.children) - 1 and len(parent.children[index + 1].keys) > 1:
-            right_sibling = parent.children[index + 1]
+    def __enter__(self):
+        return self
 
-            child.keys.append(parent.keys[index])
+    def __exit__(self, *exc):
+        self.close()
 
-            parent.keys[index] = right_sibling.keys.pop(0)
+    # ---------- páginas e pool LRU ----------
+    def _read_page(self, page_id):
+        raw = os.pread(self._fd, self.page_size, page_id * self.page_size)
+        leaf, count = self._NODE_HEADER.unpack_from(raw, 0)
+        offset = self._NODE_HEADER.size
+        keys = list(self._keys_struct.unpack_from(raw, offset)[:count])
+        children = []
+        if not leaf:
+            offset += self._keys_struct.size
+            children = list(self._children_struct.unpack_from(raw, offset)[:count + 1])
+        return DiskPage(page_id, bool(leaf), keys, children)
 
-            if not right_sibling.is_leaf():
-                child.children.append(right_sibling.children.pop(0))
+    def _write_page(self, page):
+        keys = page.keys + [0] * (self.max_keys - len(page.keys))
+        children = page.children + [0] * (self.order - len(page.children))
+        raw = (self._NODE_HEADER.pack(page.leaf, len(page.keys)) + self._keys_struct.pack(*keys)
+               + self._children_struct.pack(*children))
+        os.pwrite(self._fd, raw.ljust(self.page_size, b'\0'), page.page_id * self.page_size)
+        page.dirty = False
 
+    def _get(self, page_id):
+        page = self._pool.get(page_id)
+        if page is not None:
+            self._pool.move_to_end(page_id)
+            return page
+        page = self._read_page(page_id)
+        self._cache(page)
+        return page
+
+    def _cache(self, page):
+        self._pool[page.page_id] = page
+        self._pool.move_to_end(page.page_id)
+        while len(self._pool) > self.cache_pages:
+            _, evicted = self._pool.popitem(last=False)
+            if evicted.dirty:
+                self._write_page(evicted)
+
+    # marca a página como suja; se já tinha saído do pool, ela volta
+    def _touch(self, page):
+        page.dirty = True
+        if page.page_id not in self._pool:
+            self._cache(page)
+        else:
+            self._pool.move_to_end(page.page_id)
+
+    def _allocate(self, leaf):
+        if self._free_head:
+            page_id = self._free_head
+            _, self._free_head = self._FREE.unpack(os.pread(self._fd, self._FREE.size, page_id * self.page_size))
+        else:
+            page_id = self._page_count
+            self._page_count += 1
+        self._meta_dirty = True
+        page = DiskPage(page_id, leaf)
+        self._touch(page)
+        return page
+
+    def _release(self, page):
+        self._pool.pop(page.page_id, None)
+        raw = self._FREE.pack(self._FREE_MARK, self._free_head)
+        os.pwrite(self._fd, raw, page.page_id * self.page_size)
+        self._free_head = page.page_id
+        self._meta_dirty = True
+
+    # grava páginas sujas e o cabeçalho e força a escrita no disco
+    def flush(self):
+        for page in self._pool.values():
+            if page.dirty:
+                self._write_page(page)
+        if self._meta_dirty:
+            header = self._HEADER.pack(self.MAGIC, self.page_size, self.order, self._root_id,
+                                       self._page_count, self._free_head, self._count)
+            os.pwrite(self._fd, header.ljust(self.page_size, b'\0'), 0)
+            self._meta_dirty = False
+        os.fsync(self._fd)
+
+    def close(self):
+        if self._fd is None:
             return
+        try:
+            self.flush()
+        finally:
+            os.close(self._fd)
+            self._fd = None
+            self._pool.clear()
 
-        if index > 0:
-            # Merge com irmão esquerdo
-            left_sibling = parent.children[index - 1]
+    # rejeita chaves que não cabem no formato da página antes de mexer em
+    # qualquer coisa; senão o flush falharia para sempre com struct.error
+    def _check_key(self, value):
+        if type(value) is not int:
+            raise TypeError(f"chaves da DiskBTree devem ser int, não {type(value).__name__}")
+        if not self.KEY_MIN <= value <= self.KEY_MAX:
+            raise ValueError(f"chave {value} fora do intervalo de int64")
+
+    # ---------- operações ----------
+    # função de busca: devolve a página que contém value
+    def search(self, value):
+        self._check_key(value)
+        node = self._get(self._root_id)
+        while True:
+            i = bisect_left(node.keys, value)
+            if i < len(node.keys) and node.keys[i] == value:
+                return node
+            if node.leaf:
+                return None
+            node = self._get(node.children[i])
 
-            left_sibling.keys.append(parent.keys.pop(index - 1))
+    def __iter__(self):
+        stack = [(self._root_id, 0)]
+        while stack:
+            page_id, i = stack.pop()
+            node = self._get(page_id)
+            if node.leaf:
+                yield from node.keys
+                continue
+            if i < len(node.keys):
+                stack.append((page_id, i + 1))
+            if i > 0:
+                yield node.keys[i - 1]
+            stack.append((node.children[i], 0))
 
-            left_sibling.keys.extend(child.keys)
+    # inserção top-down: nós cheios são divididos antes da descida
+    def insert(self, value):
+        self._check_key(value)
+        root = self._get(self._root_id)
+        if len(root.keys) == self.max_keys:
+            new_root = self._allocate(leaf=False)
+            new_root.children.append(root.page_id)
+            self._split_child(new_root, 0, root)
+            self._root_id = new_root.page_id
+            self._meta_dirty = True
+            root = new_root
 
-            if not child.is_leaf():
-                left_sibling.children.extend(child.children)
+        node = root
+        while True:
+            i = bisect_left(node.keys, value)
+            if i < len(node.keys) and node.keys[i] == value:
+                return  # Duplicate
+            if node.leaf:
+                node.keys.insert(i, value)
+                self._touch(node)
+                break
+            child = self._get(node.children[i])
+            if len(child.keys) == self.max_keys:
+                self._split_child(node, i, child)
+                if value == node.keys[i]:
+                    return  # Duplicate
+                if value > node.keys[i]:
+                    child = self._get(node.children[i + 1])
+            node = child
+        self._count += 1
+        self._meta_dirty = True
 
-            parent.children.pop(index)
+    def _split_child(self, parent, index, child):
+        sibling = self._allocate(leaf=child.leaf)
+        mid = len(child.keys) // 2
+        parent.keys.insert(index, child.keys[mid])
+        parent.children.insert(index + 1, sibling.page_id)
+        sibling.keys = child.keys[mid + 1:]
+        del child.keys[mid:]
+        if not child.leaf:
+            sibling.children = child.children[mid + 1:]
+            del child.children[mid + 1:]
+        self._touch(child)
+        self._touch(parent)
 
-        else:
-            right_sibling = parent.children[index + 1]
+    # remoção top-down em uma descida (mesmo algoritmo de BTree._delete_top_down)
+    def delete(self, value):
+        self._check_key(value)
+        node = self._get(self._root_id)
+        holder = None
+        take_max = False
 
-            child.keys.append(parent.keys.pop(index))
+        while True:
+            if holder is None:
+                i = bisect_left(node.keys, value)
+                found = i < len(node.keys) and node.keys[i] == value
+                if node.leaf:
+                    if found:
+                        node.keys.pop(i)
+                        self._touch(node)
+                        self._count -= 1
+                        self._meta_dirty = True
+                    return
+                if not found:
+                    node = self._descend_with_spare(node, i)
+                    continue
+                left = self._get(node.children[i])
+                if len(left.keys) > self.min_keys:
+                    holder, take_max = (node, i), True
+                    node = left
+                    continue
+                right = self._get(node.children[i + 1])
+                if len(right.keys) > self.min_keys:
+                    holder, take_max = (node, i), False
+                    node = right
+                else:
+                    node = self._merge_children(node, i)
+                continue
 
-            child.keys.extend(right_sibling.keys)
+            if node.leaf:
+                holder_node, index = holder
+                holder_node.keys[index] = node.keys.pop() if take_max else node.keys.pop(0)
+                self._touch(holder_node)
+                self._touch(node)
+                self._count -= 1
+                self._meta_dirty = True
+                return
+            node = self._descend_with_spare(node, len(node.children) - 1 if take_max else 0)
 
-            if not right_sibling.is_leaf():
-                child.children.extend(right_sibling.children)
+    def _descend_with_spare(self, parent, index):
+        child = self._get(parent.children[index])
+        if len(child.keys) > self.min_keys:
+            return child
+        if index > 0:
+            left = self._get(parent.children[index - 1])
+            if len(left.keys) > self.min_keys:
+                child.keys.insert(0, parent.keys[index - 1])
+                parent.keys[index - 1] = left.keys.pop()
+                if not left.leaf:
+                    child.children.insert(0, left.children.pop())
+                self._touch(left)
+                self._touch(parent)
+                self._touch(child)
+                return child
+        if index < len(parent.children) - 1:
+            right = self._get(parent.children[index + 1])
+            if len(right.keys) > self.min_keys:
+                child.keys.append(parent.keys[index])
+                parent.keys[index] = right.keys.pop(0)
+                if not right.leaf:
+                    child.children.append(right.children.pop(0))
+                self._touch(right)
+                self._touch(parent)
+                self._touch(child)
+                return child
+        if index == len(parent.children) - 1:
+            index -= 1
+        return self._merge_children(parent, index)
 
-            parent.children.pop(index + 1)
-    
-    def _get_predecessor(self, node, index):
-        current = node.children[index]
-        while not current.is_leaf():
-            current = current.children[-1]
-        return current.keys[-1]
+    # funde children[index], keys[index] e children[index + 1]; libera a página da direita
+    def _merge_children(self, parent, index):
+        child = self._get(parent.children[index])
+        right = self._get(parent.children.pop(index + 1))
+        child.keys.append(parent.keys.pop(index))
+        child.keys.extend(right.keys)
+        child.children.extend(right.children)
+        self._release(right)
+        self._touch(child)
+        if parent.page_id == self._root_id and not parent.keys:
+            self._release(parent)
+            self._root_id = child.page_id
+            self._meta_dirty = True
+        else:
+            self._touch(parent)
+        return child
 
 # ==================== SPLAY TREE ====================
 class SplayNode:
+    __slots__ = ('value', 'left', 'right', 'parent')
+
     def __init__(self, value):
         self.value = value
         self.left = None
         self.right = None
         self.parent = None
 
-class SplayTree:
-    def __init__(self):
+# políticas de splay aplicadas em search(node, depth); depth é 0 na raiz
+class FullSplay:
+    def access(self, tree, node, depth):
+        tree._splay(node)
+
+# semi-splay: no caso zig-zig só o pai sobe e a subida continua a partir dele,
+# o que reduz a profundidade do caminho à metade com menos rotações
+class SemiSplay:
+    def access(self, tree, node, depth):
+        tree._semi_splay(node)
+
+# só faz splay quando o acesso foi mais fundo que threshold
+class DepthThresholdSplay:
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def access(self, tree, node, depth):
+        if depth > self.threshold:
+            tree._splay(node)
+
+# faz splay com probabilidade p
+class RandomizedSplay:
+    def __init__(self, p, seed=None):
+        if not 0 <= p <= 1:
+            raise ValueError("p deve estar entre 0 e 1")
+        self.p = p
+        self._random = random.Random(seed).random
+
+    def access(self, tree, node, depth):
+        if self._random() < self.p:
+            tree._splay(node)
+
+class SplayTree(OrderedTreeMixin):
+    node_class = SplayNode
+
+    def __init__(self, policy=None, splay_on_miss=True):
         self.root = None
+        self.policy = policy if policy is not None else FullSplay()
+        self.splay_on_miss = splay_on_miss
     
     def _right_rotate(self, node):
         left = node.left
@@ -500,8 +2141,31 @@ class SplayTree:
                 self._right_rotate(node.parent)
                 self._left_rotate(node.parent)
     
+    def _semi_splay(self, node):
+        while node.parent:
+            parent = node.parent
+            grandparent = parent.parent
+            if not grandparent:
+                if node is parent.left:
+                    self._right_rotate(parent)
+                else:
+                    self._left_rotate(parent)
+                return
+            if node is parent.left and parent is grandparent.left:
+                self._right_rotate(grandparent)
+                node = parent
+            elif node is parent.right and parent is grandparent.right:
+                self._left_rotate(grandparent)
+                node = parent
+            elif node is parent.right:
+                self._left_rotate(parent)
+                self._right_rotate(grandparent)
+            else:
+                self._right_rotate(parent)
+                self._left_rotate(grandparent)
+    
     def insert(self, value):
-        node = SplayNode(value)
+        node = self.node_class(value)
         if not self.root:
             self.root = node
             return
@@ -529,23 +2193,28 @@ class SplayTree:
     def search(self, value):
         current = self.root
         last = None
+        depth = 0
         
         while current:
             last = current
             if value == current.value:
-                self._splay(current)
+                self.policy.access(self, current, depth)
                 return current
             if value < current.value:
                 current = current.left
             else:
                 current = current.right
+            depth += 1
         
-        if last:
-            self._splay(last)
+        if last and self.splay_on_miss:
+            self.policy.access(self, last, depth - 1)
         return None
     
+    # desce sem aplicar a política; a remoção faz um único splay do nó
     def delete(self, value):
-        node = self.search(value)
+        node = self.root
+        while node and node.value != value:
+            node = node.left if value < node.value else node.right
         if not node:
             return
         
@@ -573,23 +2242,671 @@ class SplayTree:
             node = node.right
         return node
 
+    # divide em (chaves < key, chaves >= key); esta árvore fica vazia
+    def split(self, key):
+        return self._split(key, False)
+
+    # junta other, cujas chaves são todas maiores (ou todas menores); other fica vazia
+    def merge(self, other):
+        if not other.root:
+            return
+        if not self.root:
+            self.root, other.root = other.root, None
+            return
+        # os extremos são levados à raiz por splay, o que paga a descida até eles
+        self._splay(self._find_max(self.root))
+        other._splay(other._find_min(other.root))
+        if self.root.value < other.root.value:
+            low, high = self, other
+        else:
+            self._splay(self._find_min(self.root))
+            other._splay(other._find_max(other.root))
+            if not other.root.value < self.root.value:
+                raise ValueError("merge exige árvores com intervalos de chaves disjuntos")
+            low, high = other, self
+        top = low.root
+        top.right = high.root
+        high.root.parent = top
+        self.root = top
+        other.root = None
+
+    # remove todas as chaves em [lo, hi] com dois splits e um merge
+    def delete_range(self, lo, hi):
+        if hi < lo:
+            return
+        left, rest = self._split(lo, False)
+        _, right = rest._split(hi, True)
+        left.merge(right)
+        self.root = left.root
+
+    # leva ao topo o nó de key (ou o último visitado) e corta um dos lados
+    def _split(self, key, equal_goes_left):
+        left, right = self._spawn(), self._spawn()
+        node = self.root
+        last = None
+        while node:
+            last = node
+            if key == node.value:
+                break
+            node = node.left if key < node.value else node.right
+        if not last:
+            return left, right
+
+        self._splay(last)
+        root = self.root
+        self.root = None
+        if root.value < key or (equal_goes_left and root.value == key):
+            right.root = root.right
+            root.right = None
+            left.root = root
+        else:
+            left.root = root.left
+            root.left = None
+            right.root = root
+        if left.root:
+            left.root.parent = None
+        if right.root:
+            right.root.parent = None
+        return left, right
+
+    def _spawn(self):
+        return type(self)(self.policy, self.splay_on_miss)
+
+    def _find_min(self, node):
+        while node.left:
+            node = node.left
+        return node
+
+    # remove um nó sem fazer splay (o predecessor ocupa o lugar dele)
+    def _unlink(self, node):
+        if node.left and node.right:
+            pred = self._find_max(node.left)
+            if pred.parent is not node:
+                self._replace(pred, pred.left)
+                pred.left = node.left
+                pred.left.parent = pred
+            pred.right = node.right
+            pred.right.parent = pred
+            self._replace(node, pred)
+        else:
+            self._replace(node, node.left or node.right)
+        node.left = node.right = node.parent = None
+
+    def _replace(self, old, new):
+        if not old.parent:
+            self.root = new
+        elif old is old.parent.left:
+            old.parent.left = new
+        else:
+            old.parent.right = new
+        if new:
+            new.parent = old.parent
+
+# ==================== SPLAY CACHE ====================
+class SplayCacheNode(SplayNode):
+    __slots__ = ('data', 'height')
+
+    def __init__(self, value):
+        super().__init__(value)
+        self.data = None
+        self.height = 1  # altura da subárvore, para a remoção 'deepest'
+
+# SplayTree que mantém a altura de cada subárvore. O cache usa só splay completo
+# (todo ancestral do nó acessado passa por uma rotação), então basta recalcular
+# os dois nós de cada rotação; _unlink, que não faz splay, sobe corrigindo.
+class _SplayCacheTree(SplayTree):
+    node_class = SplayCacheNode
+
+    @staticmethod
+    def _update_height(node):
+        left = node.left.height if node.left else 0
+        right = node.right.height if node.right else 0
+        node.height = (left if left > right else right) + 1
+
+    def _right_rotate(self, node):
+        super()._right_rotate(node)
+        self._update_height(node)
+        self._update_height(node.parent)
+
+    def _left_rotate(self, node):
+        super()._left_rotate(node)
+        self._update_height(node)
+        self._update_height(node.parent)
+
+    def _unlink(self, node):
+        # nó mais baixo cuja subárvore muda: o antigo pai do predecessor, o
+        # próprio predecessor (que sobe para o lugar de node) ou o pai de node
+        if node.left and node.right:
+            pred = self._find_max(node.left)
+            lowest = pred if pred.parent is node else pred.parent
+        else:
+            lowest = node.parent
+        super()._unlink(node)
+        while lowest:
+            self._update_height(lowest)
+            lowest = lowest.parent
+
+# Cache ordenado chave -> valor sobre uma SplayTree: acessos recentes ficam perto
+# da raiz. Ao passar de capacity remove a entrada menos usada ('lru') ou a folha
+# mais profunda, seguindo as alturas ('deepest'); a remoção não faz splay.
+class SplayCache:
+    EVICTIONS = ('lru', 'deepest')
+
+    def __init__(self, capacity, eviction='lru'):
+        if capacity < 1:
+            raise ValueError("capacity deve ser pelo menos 1")
+        if eviction not in self.EVICTIONS:
+            raise ValueError(f"eviction deve ser um de {self.EVICTIONS}")
+        self.capacity = capacity
+        self.eviction = eviction
+        self._tree = _SplayCacheTree()
+        self._nodes = OrderedDict()  # chave -> nó, da menos para a mais recente
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._nodes)
+
+    # não conta como acesso nem altera a árvore
+    def __contains__(self, key):
+        return key in self._nodes
+
+    def __iter__(self):
+        return iter(self._tree)
+
+    def get(self, key, default=None):
+        node = self._tree.search(key)
+        if node is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._nodes.move_to_end(key)
+        return node.data
+
+    def put(self, key, value):
+        node = self._nodes.get(key)
+        if node is None:
+            self._tree.insert(key)
+            node = self._tree.root
+            self._nodes[key] = node
+        else:
+            self._tree._splay(node)
+            self._nodes.move_to_end(key)
+        node.data = value
+        if len(self._nodes) > self.capacity:
+            self._evict()
+
+    def delete(self, key):
+        node = self._nodes.pop(key, None)
+        if node is not None:
+            self._tree._unlink(node)
+
+    # maior chave <= key, como par (chave, valor), sem contar acesso
+    def floor(self, key):
+        return self._item(self._tree._upper_node(key, True))
+
+    # menor chave >= key, como par (chave, valor), sem contar acesso
+    def ceiling(self, key):
+        return self._item(self._tree._lower_node(key, True))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def _item(self, node):
+        return (node.value, node.data) if node else None
+
+    def _evict(self):
+        if self.eviction == 'lru':
+            key, node = self._nodes.popitem(last=False)
+        else:
+            node = self._deep_leaf()
+            key = node.value
+            del self._nodes[key]
+        self._tree._unlink(node)
+        self.evictions += 1
+
+    # desce da raiz sempre pelo filho mais alto até a folha mais profunda
+    def _deep_leaf(self):
+        node = self._tree.root
+        while node.left or node.right:
+            left, right = node.left, node.right
+            if not right or (left and left.height >= right.height):
+                node = left
+            else:
+                node = right
+        return node
+
+# ==================== SPLAY TREE (TOP-DOWN) ====================
+# Splay top-down de Sleator e Tarjan: a árvore é reorganizada durante a própria
+# descida, montando as subárvores esquerda e direita num nó cabeçalho. Não há
+# ponteiro para o pai nem segunda passada de subida.
+class TDSplayNode:
+    __slots__ = ('value', 'left', 'right')
+
+    def __init__(self, value):
+        self.value = value
+        self.left = None
+        self.right = None
+
+class TopDownSplayTree:
+    def __init__(self):
+        self.root = None
+        self._header = TDSplayNode(None)
+    
+    # leva value (ou o último nó visitado) para a raiz
+    def _splay(self, value):
+        node = self.root
+        header = self._header
+        header.left = header.right = None
+        left = right = header
+        while True:
+            if value < node.value:
+                if not node.left:
+                    break
+                if value < node.left.value:
+                    # zig-zig: rotação à direita
+                    child = node.left
+                    node.left = child.right
+                    child.right = node
+                    node = child
+                    if not node.left:
+                        break
+                right.left = node
+                right = node
+                node = node.left
+            elif value > node.value:
+                if not node.right:
+                    break
+                if value > node.right.value:
+                    # zig-zig: rotação à esquerda
+                    child = node.right
+                    node.right = child.left
+                    child.left = node
+                    node = child
+                    if not node.right:
+                        break
+                left.right = node
+                left = node
+                node = node.right
+            else:
+                break
+        left.right = node.left
+        right.left = node.right
+        node.left = header.right
+        node.right = header.left
+        self.root = node
+    
+    def insert(self, value):
+        if not self.root:
+            self.root = TDSplayNode(value)
+            return
+        self._splay(value)
+        root = self.root
+        if value == root.value:
+            return
+        node = TDSplayNode(value)
+        if value < root.value:
+            node.left = root.left
+            node.right = root
+            root.left = None
+        else:
+            node.right = root.right
+            node.left = root
+            root.right = None
+        self.root = node
+    
+    def search(self, value):
+        if not self.root:
+            return None
+        self._splay(value)
+        if self.root.value == value:
+            return self.root
+        return None
+    
+    def delete(self, value):
+        if not self.search(value):
+            return
+        root = self.root
+        if not root.left:
+            self.root = root.right
+        else:
+            right = root.right
+            self.root = root.left
+            # value é maior que tudo à esquerda: o máximo sobe para a raiz
+            self._splay(value)
+            self.root.right = right
+
 # ==================== K-D TREE ====================
+# Métricas de distância da KDTree. Cada uma trabalha numa forma "reduzida" que
+# preserva a ordem (a euclidiana fica ao quadrado, sem sqrt), e fornece:
+#   kernel(k)            função (a, b) -> distância reduzida, desenrolada p/ k=2 e 3
+#   axis_bound(d, axis)  limite inferior vindo de uma diferença num só eixo
+#   box_bound(t, lo, hi) limite inferior até uma caixa delimitadora
+#   reduce(r) / true(d)  conversão entre distância real e reduzida
+#   accumulate(...)      o mesmo termo por eixo, vetorizado com numpy
+class DistanceMetric:
+    """
+    Base class for KDTree metrics; subclasses implement kernel, axis_bound,
+    box_bound and accumulate. weights, if given, scale each axis.
+    """
+    
+    def __init__(self, weights=None):
+        if weights is not None and min(weights) <= 0:
+            raise ValueError("weights must be positive")
+        self.weights = tuple(weights) if weights is not None else None
+    
+    def weight(self, axis):
+        return self.weights[axis] if self.weights is not None else 1
+    
+    def reduce(self, r):
+        return r
+    
+    def true(self, d):
+        return d
+
+
+class EuclideanMetric(DistanceMetric):
+    """Euclidean (L2) distance, optionally with per-axis weights:
+    sqrt(sum(w[i] * (a[i] - b[i]) ** 2))."""
+    
+    def kernel(self, k):
+        w = self.weights
+        if w is None:
+            if k == 2:
+                def distance(a, b):
+                    x = a[0] - b[0]
+                    y = a[1] - b[1]
+                    return x * x + y * y
+            elif k == 3:
+                def distance(a, b):
+                    x = a[0] - b[0]
+                    y = a[1] - b[1]
+                    z = a[2] - b[2]
+                    return x * x + y * y + z * z
+            else:
+                def distance(a, b):
+                    return sum((x - y) ** 2 for x, y in zip(a, b))
+        elif k == 2:
+            w0, w1 = w
+            def distance(a, b):
+                x = a[0] - b[0]
+                y = a[1] - b[1]
+                return w0 * x * x + w1 * y * y
+        elif k == 3:
+            w0, w1, w2 = w
+            def distance(a, b):
+                x = a[0] - b[0]
+                y = a[1] - b[1]
+                z = a[2] - b[2]
+                return w0 * x * x + w1 * y * y + w2 * z * z
+        else:
+            def distance(a, b):
+                return sum(c * (x - y) ** 2 for c, x, y in zip(w, a, b))
+        return distance
+    
+    def axis_bound(self, diff, axis):
+        return self.weight(axis) * diff * diff
+    
+    def box_bound(self, target, lo, hi):
+        total = 0
+        for axis, (low, high, c) in enumerate(zip(lo, hi, target)):
+            gap = low - c if c < low else c - high if c > high else 0
+            total += self.weight(axis) * gap * gap
+        return total
+    
+    def reduce(self, r):
+        return r * r
+    
+    def true(self, d):
+        return d ** 0.5  # works for floats and numpy arrays alike
+    
+    def accumulate(self, total, diff, axis):
+        total += self.weight(axis) * diff * diff
+
+
+class ManhattanMetric(DistanceMetric):
+    """Manhattan (L1) distance, optionally weighted: sum(w[i] * |a[i] - b[i]|)."""
+    
+    def kernel(self, k):
+        w = self.weights
+        if w is None:
+            if k == 2:
+                def distance(a, b):
+                    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+            elif k == 3:
+                def distance(a, b):
+                    return abs(a[0] - b[0]) + abs(a[1] - b[1]) + abs(a[2] - b[2])
+            else:
+                def distance(a, b):
+                    return sum(abs(x - y) for x, y in zip(a, b))
+        elif k == 2:
+            w0, w1 = w
+            def distance(a, b):
+                return w0 * abs(a[0] - b[0]) + w1 * abs(a[1] - b[1])
+        elif k == 3:
+            w0, w1, w2 = w
+            def distance(a, b):
+                return w0 * abs(a[0] - b[0]) + w1 * abs(a[1] - b[1]) + w2 * abs(a[2] - b[2])
+        else:
+            def distance(a, b):
+                return sum(c * abs(x - y) for c, x, y in zip(w, a, b))
+        return distance
+    
+    def axis_bound(self, diff, axis):
+        return self.weight(axis) * abs(diff)
+    
+    def box_bound(self, target, lo, hi):
+        total = 0
+        for axis, (low, high, c) in enumerate(zip(lo, hi, target)):
+            if c < low:
+                total += self.weight(axis) * (low - c)
+            elif c > high:
+                total += self.weight(axis) * (c - high)
+        return total
+    
+    def accumulate(self, total, diff, axis):
+        total += self.weight(axis) * np.abs(diff)
+
+
+class ChebyshevMetric(DistanceMetric):
+    """Chebyshev (L-infinity) distance, optionally weighted:
+    max(w[i] * |a[i] - b[i]|)."""
+    
+    def kernel(self, k):
+        w = self.weights
+        if w is None:
+            if k == 2:
+                def distance(a, b):
+                    x = abs(a[0] - b[0])
+                    y = abs(a[1] - b[1])
+                    return x if x > y else y
+            elif k == 3:
+                def distance(a, b):
+                    x = abs(a[0] - b[0])
+                    y = abs(a[1] - b[1])
+                    z = abs(a[2] - b[2])
+                    if y > x:
+                        x = y
+                    return x if x > z else z
+            else:
+                def distance(a, b):
+                    return max(abs(x - y) for x, y in zip(a, b))
+        elif k == 2:
+            w0, w1 = w
+            def distance(a, b):
+                x = w0 * abs(a[0] - b[0])
+                y = w1 * abs(a[1] - b[1])
+                return x if x > y else y
+        elif k == 3:
+            w0, w1, w2 = w
+            def distance(a, b):
+                x = w0 * abs(a[0] - b[0])
+                y = w1 * abs(a[1] - b[1])
+                z = w2 * abs(a[2] - b[2])
+                if y > x:
+                    x = y
+                return x if x > z else z
+        else:
+            def distance(a, b):
+                return max(c * abs(x - y) for c, x, y in zip(w, a, b))
+        return distance
+    
+    def axis_bound(self, diff, axis):
+        return self.weight(axis) * abs(diff)
+    
+    def box_bound(self, target, lo, hi):
+        best = 0
+        for axis, (low, high, c) in enumerate(zip(lo, hi, target)):
+            gap = low - c if c < low else c - high if c > high else 0
+            best = max(best, self.weight(axis) * gap)
+        return best
+    
+    def accumulate(self, total, diff, axis):
+        np.maximum(total, self.weight(axis) * np.abs(diff), out=total)
+
+
 class KDNode:
+    __slots__ = ('point', 'axis', 'left', 'right', 'parent', 'size', 'lo', 'hi', 'dead', 'live')
+
     def __init__(self, point, axis):
         self.point = point
         self.axis = axis
         self.left = None
         self.right = None
         self.parent = None
+        self.size = 1  # nodes in this subtree
+        self.lo = self.hi = tuple(point)  # bounding box of this subtree
+        self.dead = False  # tombstone: still routes searches, never returned
+        self.live = 1  # nodes in this subtree that are not dead
 
 class KDTree:
-    def __init__(self, k=2):
+    AXIS_SELECTIONS = ('cycle', 'spread')
+
+    def __init__(self, k=2, axis_selection='cycle', alpha=None, tombstone_threshold=None, metric=None):
         """
         Initialize a k-D tree
         k: number of dimensions (default is 2 for 2D points)
+        axis_selection: how build() picks split axes, 'cycle' (depth % k)
+            or 'spread' (axis with the largest coordinate range)
+        alpha: enables dynamic mode when set (0.5 < alpha < 1). A subtree
+            whose larger child holds more than alpha of its nodes is rebuilt
+            by median split (scapegoat-style), keeping depth O(log n)
+            amortized; the whole tree is rebuilt once deletes shrink it below
+            alpha of its peak size. Every rebuild and the nodes it placed
+            are counted in rebuilds / rebuilt_nodes.
+        tombstone_threshold: enables lazy deletion when set (0 < t < 1).
+            delete only marks the node dead in O(depth); once more than this
+            fraction of the nodes are dead, compact() rebuilds the tree from
+            the live points. Compactions are counted in compactions.
+        metric: EuclideanMetric (default), ManhattanMetric, ChebyshevMetric,
+            or any of them with per-axis weights; nearest-neighbor queries,
+            their pruning bounds and the reported distances all follow it.
+        Each node stores its own split axis; inserts use (parent axis + 1) % k.
         """
+        if axis_selection not in self.AXIS_SELECTIONS:
+            raise ValueError(f"axis_selection must be one of {self.AXIS_SELECTIONS}")
+        if alpha is not None and not 0.5 < alpha < 1:
+            raise ValueError("alpha must be between 0.5 and 1")
+        if tombstone_threshold is not None and not 0 < tombstone_threshold < 1:
+            raise ValueError("tombstone_threshold must be between 0 and 1")
+        metric = metric if metric is not None else EuclideanMetric()
+        if metric.weights is not None and len(metric.weights) != k:
+            raise ValueError(f"metric needs {k} weights")
         self.root = None
         self.k = k
+        self.axis_selection = axis_selection
+        self.alpha = alpha
+        self.tombstone_threshold = tombstone_threshold
+        self.metric = metric
+        # distance in the metric's reduced form, specialized for k
+        self._distance = metric.kernel(k)
+        self.rebuilds = 0
+        self.rebuilt_nodes = 0
+        self.compactions = 0
+        self.max_size = 0  # largest size since the last full rebuild
+        self.last_visits = 0
+    
+    def __len__(self):
+        return self.root.live if self.root else 0
+    
+    @classmethod
+    def build(cls, points, k=None, axis_selection='cycle', alpha=None, tombstone_threshold=None,
+              metric=None):
+        """
+        Build a balanced tree by splitting at the median of each subtree.
+        Points are presorted once per axis (O(k n log n)) and the sorted
+        index lists are partitioned stably at every level, so no level sorts.
+        """
+        points = list(points)
+        if k is None:
+            k = len(points[0]) if points else 2
+        tree = cls(k, axis_selection, alpha, tombstone_threshold, metric)
+        for point in points:
+            if len(point) != k:
+                raise ValueError(f"Point must have {k} dimensions")
+        tree.root = tree._build_nodes(points, 0)
+        tree.max_size = len(points)
+        return tree
+    
+    def _build_nodes(self, points, first_axis):
+        """Median-split points into a subtree; returns its root (or None)."""
+        n = len(points)
+        if n == 0:
+            return None
+        k = self.k
+        orders = [sorted(range(n), key=lambda i, a=a: points[i][a]) for a in range(k)]
+        side = [0] * n
+        stamp = 0
+        spread = self.axis_selection == 'spread'
+        
+        # explicit stack: a run of points equal on the split axis all go
+        # right and would otherwise be one recursive call per point
+        root = None
+        nodes = []
+        stack = [(orders, 0, None, None)]
+        while stack:
+            orders, depth, parent, side_name = stack.pop()
+            count = len(orders[0])
+            if count == 0:
+                continue
+            if spread:
+                axis = max(range(k), key=lambda a: points[orders[a][-1]][a] - points[orders[a][0]][a])
+            else:
+                axis = (first_axis + depth) % k
+            by_axis = orders[axis]
+            m = count // 2
+            median_value = points[by_axis[m]][axis]
+            # left subtree holds strictly smaller coordinates, like insert
+            while m > 0 and points[by_axis[m - 1]][axis] == median_value:
+                m -= 1
+            median = by_axis[m]
+            stamp += 1
+            mark = stamp
+            for i in by_axis[:m]:
+                side[i] = mark
+            left_orders, right_orders = [], []
+            for order in orders:
+                left_orders.append([i for i in order if side[i] == mark])
+                right_orders.append([i for i in order if side[i] != mark and i != median])
+            
+            node = KDNode(points[median], axis)
+            node.parent = parent
+            node.size = node.live = count
+            if parent is None:
+                root = node
+            else:
+                setattr(parent, side_name, node)
+            nodes.append(node)
+            stack.append((right_orders, depth + 1, node, 'right'))
+            stack.append((left_orders, depth + 1, node, 'left'))
+        
+        # children are created after their parent, so boxes fill bottom-up
+        for node in reversed(nodes):
+            self._refresh_box(node)
+        return root
     
     def insert(self, point):
         """Insert a point (list of coordinates) into the k-D tree"""
@@ -598,122 +2915,274 @@ class KDTree:
         
         if not self.root:
             self.root = KDNode(point, 0)
+            self.max_size = max(self.max_size, 1)
             return
         
-        self._insert_recursive(self.root, point, 0)
+        node = self.root
+        depth = 0
+        axes = range(self.k)
+        outside = False
+        while True:
+            node.size += 1
+            node.live += 1
+            # boxes only grow when the point falls outside them, and a point
+            # outside a node's box is outside every box below it as well
+            if not outside:
+                lo, hi = node.lo, node.hi
+                for a in axes:
+                    x = point[a]
+                    if x < lo[a] or x > hi[a]:
+                        outside = True
+                        break
+            if outside:
+                lo, hi = list(node.lo), list(node.hi)
+                for a in axes:
+                    x = point[a]
+                    if x < lo[a]:
+                        lo[a] = x
+                    elif x > hi[a]:
+                        hi[a] = x
+                node.lo, node.hi = tuple(lo), tuple(hi)
+            axis = node.axis
+            side = 'left' if point[axis] < node.point[axis] else 'right'
+            child = getattr(node, side)
+            if child is None:
+                break
+            node = child
+            depth += 1
+        
+        child = KDNode(point, (axis + 1) % self.k)
+        child.parent = node
+        setattr(node, side, child)
+        self.max_size = max(self.max_size, self.root.size)
+        
+        # scapegoat: only a node deeper than log_{1/alpha}(n) can sit below an
+        # alpha-unbalanced ancestor, so shallow inserts skip the walk up
+        if self.alpha is not None and depth + 1 > math.log(self.root.size, 1 / self.alpha):
+            scapegoat = None
+            node = child.parent
+            while node is not None:
+                if self._unbalanced(node):
+                    scapegoat = node
+                node = node.parent
+            if scapegoat is not None:
+                self._rebalance(scapegoat)
     
-    def _insert_recursive(self, node, point, depth):
-        axis = depth % self.k
-        
-        if point[axis] < node.point[axis]:
-            if node.left is None:
-                node.left = KDNode(point, axis)
-                node.left.parent = node
-            else:
-                self._insert_recursive(node.left, point, depth + 1)
+    def _refresh_box(self, node):
+        """Recompute node's bounding box from its point and its children."""
+        lo = list(node.point)
+        hi = lo[:]
+        for child in (node.left, node.right):
+            if child is not None:
+                child_lo, child_hi = child.lo, child.hi
+                for a in range(self.k):
+                    if child_lo[a] < lo[a]:
+                        lo[a] = child_lo[a]
+                    if child_hi[a] > hi[a]:
+                        hi[a] = child_hi[a]
+        node.lo, node.hi = tuple(lo), tuple(hi)
+    
+    def _unbalanced(self, node):
+        heavier = max(node.left.size if node.left else 0, node.right.size if node.right else 0)
+        return heavier > self.alpha * node.size
+    
+    def _subtree_points(self, node):
+        """Live points of node's subtree."""
+        points = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if not node.dead:
+                points.append(node.point)
+            if node.left is not None:
+                stack.append(node.left)
+            if node.right is not None:
+                stack.append(node.right)
+        return points
+    
+    def _rebuild(self, node):
+        """
+        Replace node's subtree by a median-split rebuild of its live points.
+        Tombstones dropped on the way are taken off the ancestors' sizes
+        and boxes. Returns the number of points placed.
+        """
+        points = self._subtree_points(node)
+        parent = node.parent
+        subtree = self._build_nodes(points, node.axis)
+        if subtree is not None:
+            subtree.parent = parent
+        if parent is None:
+            self.root = subtree
+        elif parent.left is node:
+            parent.left = subtree
         else:
-            if node.right is None:
-                node.right = KDNode(point, axis)
-                node.right.parent = node
-            else:
-                self._insert_recursive(node.right, point, depth + 1)
+            parent.right = subtree
+        
+        dropped = node.size - node.live
+        while dropped and parent is not None:
+            parent.size -= dropped
+            self._refresh_box(parent)
+            parent = parent.parent
+        return len(points)
+    
+    def _rebalance(self, node):
+        whole_tree = node is self.root
+        self.rebuilds += 1
+        self.rebuilt_nodes += self._rebuild(node)
+        if whole_tree:
+            self.max_size = len(self)
+    
+    def compact(self):
+        """Rebuild the whole tree from its live points, dropping tombstones."""
+        if self.root:
+            self.compactions += 1
+            self._rebuild(self.root)
+            self.max_size = len(self)
     
     def search(self, point):
         """Search for a specific point in the tree"""
-        return self._search_recursive(self.root, point, 0)
-    
-    def _search_recursive(self, node, point, depth):
-        if node is None:
-            return None
-        
-        if node.point == point:
-            return node
-        
-        axis = depth % self.k
-        
-        if point[axis] < node.point[axis]:
-            return self._search_recursive(node.left, point, depth + 1)
-        else:
-            return self._search_recursive(node.right, point, depth + 1)
+        node = self.root
+        while node is not None and (node.dead or node.point != point):
+            axis = node.axis
+            node = node.left if point[axis] < node.point[axis] else node.right
+        return node
     
     def delete(self, point):
         """Delete a point from the tree"""
-        self.root = self._delete_recursive(self.root, point, 0)
+        target = self.search(point)
+        if target is None:
+            return
+        if self.tombstone_threshold is not None:
+            target.dead = True
+            node = target
+            while node is not None:
+                node.live -= 1
+                node = node.parent
+            if self.root.size - self.root.live > self.tombstone_threshold * self.root.size:
+                self.compact()
+            return
+        if self.alpha is None:
+            self.root = self._delete_recursive(self.root, point)
+            return
+        path = []
+        node = target
+        while node is not None:
+            path.append(node)
+            node = node.parent
+        self.root = self._delete_recursive(self.root, point)
+        
+        # dynamic mode: the whole tree is rebuilt once it has shrunk below
+        # alpha of its peak size (classic scapegoat rule); otherwise the
+        # highest alpha-unbalanced node on the deletion path is rebuilt
+        if not self.root:
+            self.max_size = 0
+        elif self.root.size < self.alpha * self.max_size:
+            self._rebalance(self.root)
+        else:
+            for node in reversed(path):
+                if self._unbalanced(node):
+                    self._rebalance(node)
+                    break
     
-    def _delete_recursive(self, node, point, depth):
+    def _delete_recursive(self, node, point):
         if node is None:
             return None
         
-        axis = depth % self.k
+        axis = node.axis
+        node.size -= 1  # delete() checked that point is in this subtree
+        node.live -= 1
+        # the box can only shrink if the removed point lies on one of its faces
+        lo, hi = node.lo, node.hi
+        shrinks = False
+        for a in range(self.k):
+            x = point[a]
+            if x == lo[a] or x == hi[a]:
+                shrinks = True
+                break
         
         if node.point == point:
             # Node to delete found
             if node.right is not None:
                 # Find minimum in right subtree
-                min_node = self._find_min(node.right, axis, depth + 1)
+                min_node = self._find_min(node.right, axis)
                 node.point = min_node.point
-                node.right = self._delete_recursive(node.right, min_node.point, depth + 1)
+                node.right = self._delete_recursive(node.right, min_node.point)
             elif node.left is not None:
                 # Find minimum in left subtree
-                min_node = self._find_min(node.left, axis, depth + 1)
+                min_node = self._find_min(node.left, axis)
                 node.point = min_node.point
-                node.right = self._delete_recursive(node.left, min_node.point, depth + 1)
+                node.right = self._delete_recursive(node.left, min_node.point)
                 node.left = None
             else:
                 # Leaf node
                 return None
+            if node.right is not None:
+                node.right.parent = node
+            if shrinks:
+                self._refresh_box(node)
             return node
         
         if point[axis] < node.point[axis]:
-            node.left = self._delete_recursive(node.left, point, depth + 1)
+            node.left = self._delete_recursive(node.left, point)
+            if node.left is not None:
+                node.left.parent = node
         else:
-            node.right = self._delete_recursive(node.right, point, depth + 1)
+            node.right = self._delete_recursive(node.right, point)
+            if node.right is not None:
+                node.right.parent = node
         
+        if shrinks:
+            self._refresh_box(node)
         return node
     
-    def _find_min(self, node, axis, depth):
+    def _find_min(self, node, axis):
         """Find node with minimum value on given axis"""
         if node is None:
             return None
         
-        current_axis = depth % self.k
-        
-        if current_axis == axis:
-            if node.left is None:
-                return node
-            return self._find_min(node.left, axis, depth + 1)
-        
-        # Check all subtrees
-        min_node = node
-        left_min = self._find_min(node.left, axis, depth + 1)
-        right_min = self._find_min(node.right, axis, depth + 1)
-        
-        if left_min and left_min.point[axis] < min_node.point[axis]:
-            min_node = left_min
-        if right_min and right_min.point[axis] < min_node.point[axis]:
-            min_node = right_min
-        
-        return min_node
+        # the bounding boxes say which child holds the minimum, so this is
+        # a single root-to-node walk instead of a search of both subtrees
+        low = node.lo[axis]
+        while node.point[axis] != low:
+            node = node.left if node.left is not None and node.left.lo[axis] == low else node.right
+        return node
     
-    def nearest_neighbor(self, target_point):
-        """Find the nearest point to the target point"""
+    def nearest_neighbor(self, target_point, eps=0.0, max_visits=None, best_bin_first=False):
+        """
+        Find the nearest point to the target point
+        eps: accept an answer within (1 + eps) of the true nearest distance;
+            subtrees that cannot beat the current best by that factor are
+            skipped
+        max_visits: stop after visiting this many nodes and return the best
+            so far (bounds the worst-case latency)
+        best_bin_first: visit subtrees in order of their bounding-box
+            distance from a priority queue instead of depth-first, which
+            finds good candidates early when the visit budget is tight
+        The number of nodes visited by the last call is kept in last_visits.
+        """
+        self.last_visits = 0
         if not self.root:
             return None
         
-        best = [self.root, float('inf')]
-        self._nearest_recursive(self.root, target_point, 0, best)
+        factor = self.metric.reduce(1 + eps)  # distances are compared reduced
+        budget = float('inf') if max_visits is None else max_visits
+        if best_bin_first:
+            return self._nearest_best_bin_first(target_point, factor, budget)
+        best = [None, float('inf')]
+        self._nearest_recursive(self.root, target_point, best, factor, budget)
         return best[0]
     
-    def _nearest_recursive(self, node, target, depth, best):
-        if node is None:
+    def _nearest_recursive(self, node, target, best, factor=1, budget=float('inf')):
+        if node is None or not node.live or self.last_visits >= budget:
             return
         
+        self.last_visits += 1
         dist = self._distance(node.point, target)
-        if dist < best[1]:
+        if dist < best[1] and not node.dead:
             best[0] = node
             best[1] = dist
         
-        axis = depth % self.k
+        axis = node.axis
         diff = target[axis] - node.point[axis]
         
         if diff < 0:
@@ -723,35 +3192,488 @@ class KDTree:
             near_subtree = node.right
             far_subtree = node.left
         
-        self._nearest_recursive(near_subtree, target, depth + 1, best)
+        self._nearest_recursive(near_subtree, target, best, factor, budget)
+        
+        if self.metric.axis_bound(diff, axis) * factor < best[1]:
+            self._nearest_recursive(far_subtree, target, best, factor, budget)
+    
+    def _nearest_best_bin_first(self, target, factor, budget):
+        best, best_dist = None, float('inf')
+        heap = [(0, 0, self.root)]  # (squared box distance, tiebreak, node)
+        count = 1
+        while heap and self.last_visits < budget:
+            bound, _, node = heappop(heap)
+            if bound * factor >= best_dist:
+                break  # every remaining subtree is at least this far
+            self.last_visits += 1
+            if not node.dead:
+                dist = self._distance(node.point, target)
+                if dist < best_dist:
+                    best, best_dist = node, dist
+            for child in (node.left, node.right):
+                if child is not None and child.live:
+                    bound = self.metric.box_bound(target, child.lo, child.hi)
+                    if bound * factor < best_dist:
+                        heappush(heap, (bound, count, child))
+                        count += 1
+        return best
+    
+    def knn(self, target, k):
+        """
+        Find the k points closest to target.
+        Returns (distance, node) pairs sorted by distance. A max-heap of the
+        k best so far is kept; a subtree is skipped once its splitting plane
+        is farther than the current k-th distance. Distances follow the
+        tree's metric.
+        """
+        if k <= 0 or not len(self):
+            return []
+        
+        heap = []  # (-reduced distance, tiebreak, node)
+        count = 0
+        axis_bound = self.metric.axis_bound
+        stack = [(self.root, 0)]
+        while stack:
+            node, bound = stack.pop()
+            if len(heap) == k and bound >= -heap[0][0]:
+                continue
+            if not node.dead:
+                dist = self._distance(node.point, target)
+                if len(heap) < k:
+                    heappush(heap, (-dist, count, node))
+                    count += 1
+                elif dist < -heap[0][0]:
+                    heapreplace(heap, (-dist, count, node))
+                    count += 1
+            
+            axis = node.axis
+            diff = target[axis] - node.point[axis]
+            if diff < 0:
+                near_subtree, far_subtree = node.left, node.right
+            else:
+                near_subtree, far_subtree = node.right, node.left
+            # far side is pushed first so the near side is explored first
+            if far_subtree is not None and far_subtree.live:
+                stack.append((far_subtree, max(bound, axis_bound(diff, axis))))
+            if near_subtree is not None and near_subtree.live:
+                stack.append((near_subtree, bound))
+        
+        heap.sort(key=lambda item: (-item[0], item[1]))
+        true = self.metric.true
+        return [(true(-neg), node) for neg, _, node in heap]
+    
+    def radius_search(self, target, r):
+        """
+        Find every point within distance r of target (inclusive), measured
+        with the tree's metric.
+        Returns (distance, node) pairs sorted by distance.
+        """
+        metric = self.metric
+        limit = metric.reduce(r)
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            if not node.dead:
+                dist = self._distance(node.point, target)
+                if dist <= limit:
+                    found.append((dist, node))
+            
+            # left points are strictly below the split, right ones at or above
+            axis = node.axis
+            diff = target[axis] - node.point[axis]
+            if node.left is not None and node.left.live and \
+                    (diff <= 0 or metric.axis_bound(diff, axis) < limit):
+                stack.append(node.left)
+            if node.right is not None and node.right.live and \
+                    (diff >= 0 or metric.axis_bound(diff, axis) <= limit):
+                stack.append(node.right)
+        
+        found.sort(key=lambda item: item[0])
+        return [(metric.true(dist), node) for dist, node in found]
+    
+    def query_many(self, targets, k=1, workers=None, chunk_size=1024):
+        """
+        k-nearest-neighbor search for many targets on a process pool.
+        Yields one knn()-style list of (distance, node) pairs per target, in
+        input order, as soon as its chunk is done; targets may be any
+        iterable. The tree is flattened once into a shared memory block that
+        the workers attach to, so only targets and (distance, index) results
+        cross process boundaries. workers defaults to os.cpu_count(); with a
+        single worker the queries run in this process.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from collections import deque
+        from itertools import islice
+        from multiprocessing import shared_memory
+        
+        workers = workers or os.cpu_count() or 1
+        targets = iter(targets)
+        if workers == 1 or not len(self):
+            for target in targets:
+                yield self.knn(target, k)
+            return
         
-        if diff * diff < best[1]:
-            self._nearest_recursive(far_subtree, target, depth + 1, best)
+        nodes, layout = self._flatten()
+        shm = shared_memory.SharedMemory(create=True, size=len(layout))
+        try:
+            shm.buf[:len(layout)] = layout
+            with ProcessPoolExecutor(max_workers=workers, initializer=_kd_shared_attach,
+                                     initargs=(shm.name, len(nodes), self.k, self.metric)) as pool:
+                pending = deque()
+                
+                def submit():
+                    chunk = list(islice(targets, chunk_size))
+                    if chunk:
+                        pending.append(pool.submit(_kd_shared_knn, chunk, k))
+                    return bool(chunk)
+                
+                # a few chunks in flight per worker keeps everyone busy
+                # without reading the whole target stream up front
+                while len(pending) < 2 * workers and submit():
+                    pass
+                while pending:
+                    results = pending.popleft().result()
+                    submit()
+                    for pairs in results:
+                        yield [(dist, nodes[index]) for dist, index in pairs]
+        finally:
+            shm.close()
+            shm.unlink()
     
-    def _distance(self, point1, point2):
-        return sum((a - b) ** 2 for a, b in zip(point1, point2))
+    def _flatten(self):
+        """
+        Preorder list of nodes plus a byte layout for query_many:
+        n * k coordinates as doubles, then left, right, axis and dead flag
+        as int64 arrays (-1 for a missing child).
+        """
+        nodes = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            if node.right is not None:
+                stack.append(node.right)
+            if node.left is not None:
+                stack.append(node.left)
+        position = {id(node): i for i, node in enumerate(nodes)}
+        coords = array('d', [c for node in nodes for c in node.point])
+        left = array('q', [position[id(node.left)] if node.left is not None else -1 for node in nodes])
+        right = array('q', [position[id(node.right)] if node.right is not None else -1 for node in nodes])
+        axes = array('q', [node.axis for node in nodes])
+        dead = array('q', [node.dead for node in nodes])
+        return nodes, coords.tobytes() + left.tobytes() + right.tobytes() + axes.tobytes() + dead.tobytes()
     
     def range_search(self, min_bounds, max_bounds):
+        """
+        Nodes whose points lie inside the box [min_bounds, max_bounds].
+        Subtrees whose bounding box misses the query box are skipped, and
+        subtrees entirely inside it are taken without testing each point.
+        """
         result = []
-        self._range_search_recursive(self.root, min_bounds, max_bounds, 0, result)
+        for node, inside in self._range_walk(min_bounds, max_bounds):
+            if inside:
+                self._collect_subtree(node, result)
+            else:
+                result.append(node)
         return result
     
-    def _range_search_recursive(self, node, min_bounds, max_bounds, depth, result):
-        if node is None:
-            return
-        
-        in_range = all(min_bounds[i] <= node.point[i] <= max_bounds[i] 
-                      for i in range(self.k))
-        if in_range:
-            result.append(node)
-        
-        axis = depth % self.k
+    def range_count(self, min_bounds, max_bounds):
+        """
+        Number of points inside the box [min_bounds, max_bounds], answered
+        from the subtree counts without building a result list
+        (O(sqrt n) node visits on a balanced 2-D tree).
+        """
+        return sum(node.live if inside else 1 for node, inside in self._range_walk(min_bounds, max_bounds))
+    
+    def _range_walk(self, min_bounds, max_bounds):
+        """
+        Yield (node, True) for each maximal subtree inside the query box and
+        (node, False) for each other live node whose own point is inside it.
+        Subtrees holding only tombstones are skipped.
+        Children are tested before being pushed, so disjoint subtrees are
+        never visited.
+        """
+        bounds = list(zip(min_bounds, max_bounds))
         
-        if min_bounds[axis] <= node.point[axis]:
-            self._range_search_recursive(node.left, min_bounds, max_bounds, depth + 1, result)
+        def overlap(node):
+            # None: disjoint, True: contained, False: straddles the boundary
+            if not node.live:
+                return None
+            inside = True
+            for lo, hi, (low, high) in zip(node.lo, node.hi, bounds):
+                if hi < low or lo > high:
+                    return None
+                if inside and (lo < low or hi > high):
+                    inside = False
+            return inside
         
-        if max_bounds[axis] >= node.point[axis]:
-            self._range_search_recursive(node.right, min_bounds, max_bounds, depth + 1, result)
+        if not self.root:
+            return
+        state = overlap(self.root)
+        if state is None:
+            return
+        stack = [(self.root, state)]
+        while stack:
+            node, inside = stack.pop()
+            if inside:
+                yield node, True
+                continue
+            point = node.point
+            if not node.dead and all(low <= c <= high for c, (low, high) in zip(point, bounds)):
+                yield node, False
+            # the split plane rules out a side for free; boxes do the rest
+            axis = node.axis
+            if node.right is not None and max_bounds[axis] >= point[axis]:
+                state = overlap(node.right)
+                if state is not None:
+                    stack.append((node.right, state))
+            if node.left is not None and min_bounds[axis] <= point[axis]:
+                state = overlap(node.left)
+                if state is not None:
+                    stack.append((node.left, state))
+    
+    def _collect_subtree(self, node, result):
+        """Append every live node of node's subtree to result, in preorder."""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if not node.dead:
+                result.append(node)
+            if node.right is not None and node.right.live:
+                stack.append(node.right)
+            if node.left is not None and node.left.live:
+                stack.append(node.left)
+
+# executado nos processos do pool por KDTree.query_many: cada processo anexa o
+# bloco de memória compartilhada uma vez e consulta a árvore achatada
+_kd_shared = None
+
+def _kd_shared_attach(name, n, k, metric):
+    global _kd_shared
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=name)
+    coords_end = n * k * 8
+    view = shm.buf
+    coords = view[:coords_end].cast('d')
+    left = view[coords_end:coords_end + n * 8].cast('q')
+    right = view[coords_end + n * 8:coords_end + 2 * n * 8].cast('q')
+    axes = view[coords_end + 2 * n * 8:coords_end + 3 * n * 8].cast('q')
+    dead = view[coords_end + 3 * n * 8:coords_end + 4 * n * 8].cast('q')
+    _kd_shared = (shm, coords, left, right, axes, dead, k, metric)
+
+def _kd_shared_knn(targets, count):
+    _, coords, left, right, axes, dead, k, metric = _kd_shared
+    distance = metric.kernel(k)
+    axis_bound = metric.axis_bound
+    results = []
+    for target in targets:
+        heap = []  # (-reduced distance, node index)
+        stack = [(0, 0)]
+        while stack:
+            i, bound = stack.pop()
+            if len(heap) == count and bound >= -heap[0][0]:
+                continue
+            base = i * k
+            if not dead[i]:
+                dist = distance(target, coords[base:base + k])
+                if len(heap) < count:
+                    heappush(heap, (-dist, i))
+                elif dist < -heap[0][0]:
+                    heapreplace(heap, (-dist, i))
+            
+            axis = axes[i]
+            diff = target[axis] - coords[base + axis]
+            if diff < 0:
+                near_subtree, far_subtree = left[i], right[i]
+            else:
+                near_subtree, far_subtree = right[i], left[i]
+            if far_subtree >= 0:
+                stack.append((far_subtree, max(bound, axis_bound(diff, axis))))
+            if near_subtree >= 0:
+                stack.append((near_subtree, bound))
+        heap.sort(key=lambda item: (-item[0], item[1]))
+        results.append([(metric.true(-neg), i) for neg, i in heap])
+    return results
+
+# ==================== K-D TREE (NUMPY) ====================
+class FlatKDTree:
+    """
+    Static k-D tree over one contiguous (n, k) NumPy array.
+    The points are reordered so that every leaf bucket is a contiguous slice;
+    the tree itself is a set of parallel arrays (split axis, split value,
+    children, index range and bounding box per node). Leaves are scanned with
+    vectorized distance computations instead of per-point Python code.
+    metric takes the same metric objects as KDTree; their accumulate()
+    kernels run over whole query-by-bucket blocks. Requires numpy.
+    """
+    BATCH_CHUNK = 1024  # queries per block in query_batch (bounds memory use)
+    
+    def __init__(self, points, leaf_size=32, metric=None):
+        if np is None:
+            raise ImportError("FlatKDTree requires numpy")
+        if leaf_size < 1:
+            raise ValueError("leaf_size must be at least 1")
+        data = np.array(points, dtype=np.float64)
+        if data.ndim != 2 or len(data) == 0:
+            raise ValueError("points must be a non-empty (n, k) array")
+        self.n, self.k = data.shape
+        self.metric = metric if metric is not None else EuclideanMetric()
+        if self.metric.weights is not None and len(self.metric.weights) != self.k:
+            raise ValueError(f"metric needs {self.k} weights")
+        self.leaf_size = leaf_size
+        self.indices = np.arange(self.n)  # indices[i] = original position of data[i]
+        self._build(data)
+    
+    def __len__(self):
+        return self.n
+    
+    def _build(self, data):
+        indices = self.indices
+        split_axis, split_value, left, right, start, end = [], [], [], [], [], []
+        lo, hi = [], []
+        
+        def new_node(begin, stop):
+            segment = data[indices[begin:stop]]
+            split_axis.append(-1)
+            split_value.append(0.0)
+            left.append(-1)
+            right.append(-1)
+            start.append(begin)
+            end.append(stop)
+            lo.append(segment.min(axis=0))
+            hi.append(segment.max(axis=0))
+            return len(start) - 1
+        
+        stack = [new_node(0, self.n)]
+        while stack:
+            node = stack.pop()
+            begin, stop = start[node], end[node]
+            if stop - begin <= self.leaf_size:
+                continue
+            axis = int(np.argmax(hi[node] - lo[node]))
+            mid = (begin + stop) // 2
+            segment = indices[begin:stop]
+            order = np.argpartition(data[segment, axis], mid - begin)
+            indices[begin:stop] = segment[order]
+            
+            split_axis[node] = axis
+            split_value[node] = data[indices[mid], axis]
+            left[node] = new_node(begin, mid)
+            right[node] = new_node(mid, stop)
+            stack.append(left[node])
+            stack.append(right[node])
+        
+        self.data = data[indices]
+        self.split_axis = np.array(split_axis, dtype=np.intp)
+        self.split_value = np.array(split_value)
+        self.left = np.array(left, dtype=np.intp)
+        self.right = np.array(right, dtype=np.intp)
+        self.start = np.array(start, dtype=np.intp)
+        self.end = np.array(end, dtype=np.intp)
+        self.lo = np.array(lo)
+        self.hi = np.array(hi)
+    
+    def query(self, target, k=1):
+        """
+        Find the k points closest to target.
+        Returns (distances, indices) arrays sorted by distance, where
+        indices refer to positions in the original points.
+        """
+        distances, indices = self.query_batch([target], k)
+        return distances[0], indices[0]
+    
+    def query_batch(self, targets, k=1):
+        """
+        Answer k-nearest-neighbor queries for many targets in one call.
+        Returns (distances, indices), both shaped (len(targets), k), rows
+        sorted by distance; k is capped at the number of points.
+        Queries are processed in chunks with no per-query Python code:
+          1. every query descends to its home leaf at the same time;
+          2. the k-th distance to a window of points around that leaf (which
+             are spatial neighbours in tree order) gives an upper bound;
+          3. all (query, node) pairs whose bounding box is within the bound
+             are expanded level by level, collecting candidate leaves;
+          4. the candidate buckets are scanned in one block and the k best
+             per query are selected with a single sort.
+        """
+        targets = np.array(targets, dtype=np.float64).reshape(-1, self.k)
+        k = min(k, self.n)
+        distances = np.empty((len(targets), max(k, 0)))
+        indices = np.empty((len(targets), max(k, 0)), dtype=np.intp)
+        if k <= 0:
+            return distances, indices
+        for begin in range(0, len(targets), self.BATCH_CHUNK):
+            stop = begin + self.BATCH_CHUNK
+            distances[begin:stop], indices[begin:stop] = self._query_chunk(targets[begin:stop], k)
+        return self.metric.true(distances), self.indices[indices]
+    
+    def _distances(self, queries, rows):
+        """Reduced distances from queries[i] to self.data[rows[i, j]]."""
+        total = np.zeros(rows.shape)
+        for axis in range(self.k):
+            self.metric.accumulate(total, self.data[rows, axis] - queries[:, axis, None], axis)
+        return total
+    
+    def _box_distances(self, queries, nodes):
+        """Reduced distances from queries[i] to the bounding box of nodes[i]."""
+        total = np.zeros(len(nodes))
+        for axis in range(self.k):
+            column = queries[:, axis]
+            gap = np.maximum(self.lo[nodes, axis] - column, 0) + np.maximum(column - self.hi[nodes, axis], 0)
+            self.metric.accumulate(total, gap, axis)
+        return total
+    
+    def _query_chunk(self, queries, k):
+        m = len(queries)
+        # 1. home leaves
+        home = np.zeros(m, dtype=np.intp)
+        inner = self.left[home] >= 0
+        while inner.any():
+            nodes = home[inner]
+            goes_left = queries[inner, self.split_axis[nodes]] < self.split_value[nodes]
+            home[inner] = np.where(goes_left, self.left[nodes], self.right[nodes])
+            inner = self.left[home] >= 0
+        
+        # 2. upper bound for the k-th distance
+        width = min(max(k, self.leaf_size), self.n)
+        window = np.minimum(self.start[home], self.n - width)[:, None] + np.arange(width)
+        bound = np.partition(self._distances(queries, window), k - 1, axis=1)[:, k - 1]
+        
+        # 3. candidate leaves
+        pair_query = np.arange(m)
+        pair_node = np.zeros(m, dtype=np.intp)
+        leaf_query, leaf_node = [], []
+        while len(pair_query):
+            near = self._box_distances(queries[pair_query], pair_node) <= bound[pair_query]
+            pair_query, pair_node = pair_query[near], pair_node[near]
+            is_leaf = self.left[pair_node] < 0
+            leaf_query.append(pair_query[is_leaf])
+            leaf_node.append(pair_node[is_leaf])
+            pair_query, pair_node = pair_query[~is_leaf], pair_node[~is_leaf]
+            pair_query = np.concatenate((pair_query, pair_query))
+            pair_node = np.concatenate((self.left[pair_node], self.right[pair_node]))
+        leaf_query = np.concatenate(leaf_query)
+        leaf_node = np.concatenate(leaf_node)
+        
+        # 4. scan the buckets and keep the k best per query
+        bucket = min(self.leaf_size, self.n)
+        rows = self.start[leaf_node][:, None] + np.arange(bucket)
+        valid = rows < self.end[leaf_node][:, None]
+        rows = np.where(valid, rows, 0)
+        dist = self._distances(queries[leaf_query], rows)
+        owner = np.broadcast_to(leaf_query[:, None], rows.shape)
+        keep = valid & (dist <= bound[owner])
+        dist, rows, owner = dist[keep], rows[keep], owner[keep]
+        order = np.lexsort((dist, owner))
+        dist, rows, owner = dist[order], rows[order], owner[order]
+        rank = np.arange(len(owner)) - np.searchsorted(owner, owner)
+        first = rank < k
+        best_dist = np.empty((m, k))
+        best_rows = np.empty((m, k), dtype=np.intp)
+        best_dist[owner[first], rank[first]] = dist[first]
+        best_rows[owner[first], rank[first]] = rows[first]
+        return best_dist, best_rows
 
 # ==================== GUI ====================
 class TreeVisualizerApp:
@@ -1005,7 +3927,7 @@ class TreeVisualizerApp:
         
         # Draw node - check if it's Red-Black Tree or Splay Tree
         if hasattr(node, 'color'):
-            color = '#ef4444' if node.color == 'RED' else '#1e293b'
+            color = '#ef4444' if node.color is RED else '#1e293b'
         else:
             color = '#10b981'  # Green for Splay Tree
         
@@ -1024,7 +3946,7 @@ class TreeVisualizerApp:
         if not node:
             return
         
-        axis = depth % 2  # 0 for x-axis, 1 for y-axis
+        axis = node.axis  # 0 for x-axis, 1 for y-axis
         
         # Draw connections
         if node.left:
@@ -1128,7 +4050,7 @@ class TreeVisualizerApp:
         if not node:
             return
         
-        axis = depth % 2
+        axis = node.axis
         if axis == 0:  # vertical line at x = node.point[0]
             x = 50 + (node.point[0] - min_x) / (max_x - min_x) * (width - 100) if max_x != min_x else width/2
             self.canvas.create_line(x, 50, x, height-50, fill='red', width=1, dash=(5,5))